@@ -0,0 +1,173 @@
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import hashresults
+import waiter
+import wrapper
+
+EXECUTOR_WORKERS = 4
+HASH_ERROR_LOG_EMPTY = waiter.HASH_ERROR_LOG_EMPTY
+HASH_ERROR_ARGUMENT_INVALID = 5
+
+
+class HashError(Exception):
+    """a libhash call returned an error code"""
+
+    def __init__(self, function, returnCode):
+        super().__init__('{} failed: {}'.format(function, wrapper.ReturnCodes.get(returnCode, returnCode)))
+        self.function = function
+        self.returnCode = returnCode
+
+
+class AsyncHashLibrary(object):
+    """asyncio front end of HashLibrary
+
+    Blocking ctypes calls run on a small dedicated executor, waiting is done with asyncio.sleep based backoff,
+    so one event loop drives any number of concurrent HashDirectory operations without a thread per operation.
+    The shared log is read through the demultiplexer of the session, which routes every line to the queue of
+    its operation.
+    """
+
+    def __init__(self, library, workers=EXECUTOR_WORKERS):
+        if not isinstance(library, wrapper.HashLibrary):
+            library = wrapper.HashLibrary(library)
+        self.library = library
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="libhash")
+        self.demultiplexer = library.demultiplexer
+        # opID -> (asyncio.Queue of the operation, deque filled by the demultiplexer on the executor)
+        self.queues = {}
+        self.drainLock = asyncio.Lock()
+
+    async def __aenter__(self):
+        returnCode = await self.call(self.library.init)
+        if returnCode != 0:
+            raise HashError('HashInit', returnCode)
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        try:
+            await self.call(self.library.terminate)
+        finally:
+            self.executor.shutdown(wait=False)
+        return False
+
+    async def call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def hashDirectory(self, directoryFullPath):
+        returnCode, opID = await self.call(self.library.directory, directoryFullPath)
+        if returnCode != 0:
+            raise HashError('HashDirectory', returnCode)
+        return HashOperation(self, opID, self.register(opID))
+
+    def register(self, opID):
+        """create the line queue of an operation, lines logged before are kept by the demultiplexer until now"""
+        queue = asyncio.Queue()
+        received = collections.deque()
+        self.queues[opID] = (queue, received)
+        self.demultiplexer.register(opID, received.append)
+        return queue
+
+    def unregister(self, opID):
+        self.demultiplexer.unregister(opID)
+        self.queues.pop(opID, None)
+
+    async def drain(self, maxLines=None):
+        """read up to maxLines lines of the shared log into the queues of their operations, return the return
+        code of the last HashReadNextLogLine call
+
+        asyncio queues are not thread safe, the demultiplexer fills plain deques on the executor and the lines
+        are moved to the queues on the event loop.
+        """
+        async with self.drainLock:
+            returnCode, _ = await self.call(self.demultiplexer.drain, maxLines)
+        for queue, received in self.queues.values():
+            while received:
+                queue.put_nowait(received.popleft())
+        return returnCode
+
+
+class HashOperation(object):
+    """handle of one running HashDirectory operation
+
+    HashStop frees the operation ID, HashStatus of a stopped operation returns HASH_ERROR_ARGUMENT_INVALID -
+    after stop the handle reports the operation as finished instead.
+    """
+
+    def __init__(self, asyncLibrary, opID, lines):
+        self.asyncLibrary = asyncLibrary
+        self.opID = opID
+        self.lines = lines
+        self.poll = wrapper.statusPoller(asyncLibrary.library, opID)
+        self.pollLock = asyncio.Lock()
+        self.stopped = False
+
+    async def status(self):
+        # the poller reuses its output buffer, so calls of one operation must not overlap
+        async with self.pollLock:
+            returnCode, opRunning = await self.asyncLibrary.call(self.poll)
+        if returnCode == HASH_ERROR_ARGUMENT_INVALID and self.stopped:
+            return 0, False
+        return returnCode, opRunning
+
+    async def wait(self, minDelay=waiter.MIN_DELAY, maxDelay=waiter.MAX_DELAY, backoffFactor=waiter.BACKOFF_FACTOR,
+                   timeout=None):
+        """wait until the operation stops running, return the final HashStatus return code"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        delay = minDelay
+        while True:
+            returnCode, opRunning = await self.status()
+            if returnCode != 0 or not opRunning:
+                return returnCode
+            if deadline is not None and loop.time() >= deadline:
+                raise asyncio.TimeoutError('operation {} still running after {} s'.format(self.opID, timeout))
+            await asyncio.sleep(delay)
+            delay = min(delay * backoffFactor, maxDelay)
+
+    async def results(self, maxLines=1024, minDelay=waiter.MIN_DELAY, maxDelay=waiter.MAX_DELAY,
+                      backoffFactor=waiter.BACKOFF_FACTOR):
+        """async iterator of parsed log lines (opID, path, digest) of this operation while it runs
+
+        The shared log is drained in batches of up to maxLines lines per executor call, lines of other
+        operations go to their own queues. The iterator ends when the operation is not running (or was stopped)
+        and its queue is empty. It can be consumed once, its queue is released when it ends, fails or is closed.
+        A malformed line raises ValueError.
+        """
+        lines = self.lines
+        delay = minDelay
+        finished = False
+        try:
+            while True:
+                returnCode = await self.asyncLibrary.drain(maxLines)
+                if not lines.empty():
+                    delay = minDelay
+                while not lines.empty():
+                    yield hashresults.parseLogLine(lines.get_nowait())
+                if returnCode == 0:
+                    continue
+                if returnCode != HASH_ERROR_LOG_EMPTY:
+                    raise HashError('HashReadNextLogLine', returnCode)
+                if finished:
+                    return
+                statusCode, opRunning = await self.status()
+                if statusCode != 0:
+                    raise HashError('HashStatus', statusCode)
+                if not opRunning:
+                    # lines may have been logged between the last drain and the status call
+                    finished = True
+                    continue
+                await asyncio.sleep(delay)
+                delay = min(delay * backoffFactor, maxDelay)
+        finally:
+            self.asyncLibrary.unregister(self.opID)
+
+    async def stop(self):
+        # set before the call, a concurrent status poll may already see the ID freed
+        self.stopped = True
+        returnCode = await self.asyncLibrary.call(self.asyncLibrary.library.stop, self.opID)
+        if returnCode != 0:
+            self.stopped = False
+            raise HashError('HashStop', returnCode)
+        return returnCode
@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+
+import argparse
+import ctypes
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+
+from calltiming import percentiles
+import cancellation
+import corpus
+import leaktrack
+import logger
+import oracle
+import waiter
+import walker
+import wrapper
+
+inputLib = wrapper.defaultLibraryPath()
+inputDirectory = "./tested_dir"
+treesDirectory = corpus.CORPUS_DIRECTORY
+# operations started at most to collect the HashStatus samples of one tree
+STATUS_OPERATIONS = 100
+
+# metric: True when a higher value is better
+METRICS = {
+    'hashMBps': True,
+    'hashFilesPerSec': True,
+    'firstLineMs': False,
+    'statusLatencyNs': False,
+    'stopLatencyMs': False,
+    'drainLinesPerSec': True,
+}
+
+
+def timeCalls(function, iterations):
+    """run function iterations times, return average ns per call"""
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def benchmarkStatusPolling(libFullPath, iterations=100000):
+    """compare HashStatus per-call overhead of an untyped CDLL with the prototyped HashLibrary session"""
+    results = {}
+    with wrapper.HashLibrary(libFullPath) as lib:
+        returnCode, opID = lib.directory(inputDirectory)
+        if returnCode != 0:
+            raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+        while lib.status(opID)[1]:
+            pass
+
+        # fresh CDLL instance, its function pointers carry no argtypes/restype
+        untyped = ctypes.CDLL(libFullPath)
+
+        poll = lib.statusPoller(opID)
+        results['wrapper.hashStatus'] = timeCalls(lambda: wrapper.hashStatus(untyped, opID), iterations)
+        results['HashLibrary.status'] = timeCalls(lambda: lib.status(opID), iterations)
+        results['HashLibrary.statusPoller'] = timeCalls(poll, iterations)
+        lib.stop(opID)
+
+    baseline = results['wrapper.hashStatus']
+    print('\nHashStatus polling, {} calls:'.format(iterations))
+    for name, nsPerCall in results.items():
+        print('{:26} {:8.1f} ns/call, saved {:8.1f} ns ({:5.1f}%)'.format(
+            name, nsPerCall, baseline - nsPerCall, 100.0 * (baseline - nsPerCall) / baseline
+        ))
+    return results
+
+
+def benchmarkOracle(directory, workerCounts=None, chunkSize=oracle.CHUNK_SIZE, recursive=True):
+    """reference MD5 throughput of oracle.md5Files for growing worker counts"""
+    paths = list(oracle.listFiles(directory, recursive))
+    totalBytes = sum(os.path.getsize(path) for path in paths)
+    if workerCounts is None:
+        cpus = os.cpu_count() or 1
+        workerCounts = sorted({1, 2, 4, 8, 16, cpus, 2 * cpus})
+    results = {}
+    print('\nMD5 oracle, {} files, {:.1f} MB, chunk {} B:'.format(len(paths), totalBytes / 1e6, chunkSize))
+    for workers in workerCounts:
+        start = time.perf_counter()
+        oracle.md5Files(paths, workers, chunkSize)
+        elapsed = time.perf_counter() - start
+        results[workers] = totalBytes / elapsed / 1e6 if elapsed else 0.0
+        print('{:4} workers: {:10.1f} MB/s, {:10.1f} files/s, speedup {:5.2f}'.format(
+            workers, results[workers], len(paths) / elapsed if elapsed else 0.0, results[workers] / results[workerCounts[0]]
+        ))
+    return results
+
+
+def benchmarkLogging(records=20000, logFile=None):
+    """per-record cost on the calling thread of the plain file handler and of the queue handler"""
+    import tempfile
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        handlers = {
+            'TimedRotatingFileHandler': logger.getFileHandler(logFile or os.path.join(directory, 'file.log')),
+            'BoundedQueueHandler': logger.getQueueHandler(logFile or os.path.join(directory, 'queue.log')),
+        }
+        for name, handler in handlers.items():
+            benchLog = logging.getLogger('benchmark.{}'.format(name))
+            benchLog.propagate = False
+            benchLog.setLevel(logging.DEBUG)
+            benchLog.addHandler(handler)
+            clock = time.perf_counter_ns
+            samples = []
+            for index in range(records):
+                start = clock()
+                benchLog.error("%s - count of files in directory: %d,files hashed: %d", 'benchmark', index, index)
+                samples.append(clock() - start)
+            results[name] = percentiles(samples)
+            start = time.perf_counter_ns()
+            benchLog.removeHandler(handler)
+            handler.close()
+            print('{} closed (queue flushed) in {:.1f} ms'.format(name, (time.perf_counter_ns() - start) / 1e6))
+
+        record = logging.LogRecord('test', logging.ERROR, __file__, 0,
+                                   "%s - count of files in directory: %d,files hashed: %d", ('benchmark', 1, 11), None)
+        samples = []
+        for index in range(records):
+            start = clock()
+            record.asctime = None
+            logger.FORMATTER.format(record)
+            samples.append(clock() - start)
+        results['text FORMATTER.format'] = percentiles(samples)
+
+        metrics = logger.getMetricsLog(os.path.join(directory, 'metrics.jsonl'), wrapper.ReturnCodes)
+        samples = []
+        for index in range(records):
+            start = clock()
+            metrics.event(test='benchmark', call='HashDirectory', returnCode=0, durationNs=index, files=11, opID=1)
+            samples.append(clock() - start)
+        metrics.close()
+        results['MetricsLog.event'] = percentiles(samples)
+
+    print('\nlogging, {} records, ns per record on the calling thread:'.format(records))
+    for name, summary in results.items():
+        print('{:26} mean {:10.1f}, p50 {:8}, p99 {:8}, max {:10}'.format(
+            name, summary['mean'], summary['p50'], summary['p99'], summary['max']
+        ))
+    return results
+
+
+def measureHashRun(lib, directory):
+    """one HashDirectory run with concurrent log draining - returns (seconds, seconds to first line, lines)"""
+    start = time.perf_counter()
+    returnCode, opID = lib.directory(directory)
+    if returnCode != 0:
+        raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+    firstLine = None
+    lines = 0
+    for _ in waiter.iterResults(lib, opID):
+        if firstLine is None:
+            firstLine = time.perf_counter() - start
+        lines += 1
+    elapsed = time.perf_counter() - start
+    lib.stop(opID)
+    return elapsed, firstLine, lines
+
+
+def measureStatusLatency(lib, directory, calls, maxOperations=STATUS_OPERATIONS):
+    """per-call HashStatus latency in ns, sampled only while an operation is running
+
+    A call which reports the operation finished is not a sample, the next operation is started then. Trees
+    hashed faster than one call give no samples within maxOperations operations.
+    """
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(maxOperations):
+        returnCode, opID = lib.directory(directory)
+        if returnCode != 0:
+            raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+        poll = lib.statusPoller(opID)
+        while len(samples) < calls:
+            start = clock()
+            returnCode, opRunning = poll()
+            elapsed = clock() - start
+            if returnCode != 0:
+                raise RuntimeError("HashStatus failed: {}".format(wrapper.ReturnCodes[returnCode]))
+            if not opRunning:
+                break
+            samples.append(elapsed)
+        lib.stop(opID)
+        lib.drainLog()
+        if len(samples) >= calls:
+            break
+    return samples
+
+
+def measureStop(lib, directory, expected):
+    """ms from HashStop called right after HashDirectory until the log stopped growing, None when the operation
+    finished first or the stop cancelled nothing (all files were logged)
+
+    expected {relative path: digest} of the tree, the partial log is checked by cancellation.stopOperation.
+    """
+    returnCode, opID = lib.directory(directory)
+    if returnCode != 0:
+        raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+    stopped = cancellation.stopOperation(lib, opID, expected, lambda path: walker.normalizePath(path, directory),
+                                         afterMs=0)
+    if stopped['stopReturnCode'] != 0:
+        raise RuntimeError("HashStop failed: {}".format(wrapper.ReturnCodes[stopped['stopReturnCode']]))
+    if stopped['finishedEarly'] or stopped['linesBeforeStop'] + stopped['linesAfterStop'] >= len(expected):
+        return None
+    return stopped['quiescentNs'] / 1e6
+
+
+def measureDrain(lib, directory):
+    """lines per second of draining the complete log of a finished operation"""
+    returnCode, opID = lib.directory(directory)
+    waiter.pollUntilDone(lib, opID)
+    start = time.perf_counter()
+    returnCode, results = lib.drainLog()
+    elapsed = time.perf_counter() - start
+    lib.stop(opID)
+    return len(results) / elapsed if elapsed else 0.0
+
+
+def runSuite(libFullPath, trees, repeat=5, statusCalls=10000, workDirectory=treesDirectory):
+    """run all measurements on all trees, return a JSON-serializable report"""
+    report = {
+        'library': os.path.abspath(libFullPath),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'trees': {}
+    }
+    with wrapper.HashLibrary(libFullPath) as lib:
+        for treeName, profile in trees.items():
+            root = os.path.join(workDirectory, treeName)
+            manifest = corpus.generateCorpus(root, profile)
+            totalBytes = manifest['bytes']
+            expected = corpus.expectedDigests(manifest)
+            samples = {metric: [] for metric in METRICS}
+            for _ in range(repeat):
+                elapsed, firstLine, lines = measureHashRun(lib, root)
+                samples['hashMBps'].append(totalBytes / elapsed / 1e6)
+                samples['hashFilesPerSec'].append(lines / elapsed)
+                if firstLine is not None:
+                    samples['firstLineMs'].append(firstLine * 1000)
+                stopLatency = measureStop(lib, root, expected)
+                if stopLatency is not None:
+                    samples['stopLatencyMs'].append(stopLatency)
+                samples['drainLinesPerSec'].append(measureDrain(lib, root))
+            samples['statusLatencyNs'] = measureStatusLatency(lib, root, statusCalls)
+            report['trees'][treeName] = {
+                'files': manifest['files'],
+                'bytes': totalBytes,
+                'profile': profile,
+                'metrics': {metric: percentiles(values) for metric, values in samples.items() if values}
+            }
+            print('{:14} {:10.1f} MB/s {:12.1f} files/s'.format(
+                treeName, report['trees'][treeName]['metrics']['hashMBps']['p50'],
+                report['trees'][treeName]['metrics']['hashFilesPerSec']['p50']
+            ))
+    return report
+
+
+def evictFiles(paths):
+    """drop the page cache of paths with posix_fadvise(POSIX_FADV_DONTNEED), no root needed
+
+    Dirty pages are written back first, DONTNEED only drops clean ones. The advice is best effort, pages
+    mapped by another process stay cached.
+    """
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def measureSequentialRead(paths, chunkSize=oracle.CHUNK_SIZE):
+    """seconds to read all paths one after another into one reused buffer, nothing is hashed"""
+    buffer = bytearray(chunkSize)
+    start = time.perf_counter()
+    for path in paths:
+        with open(path, 'rb', buffering=0) as inputFile:
+            readinto = inputFile.readinto
+            while readinto(buffer):
+                pass
+    return time.perf_counter() - start
+
+
+def benchmarkPageCache(libFullPath, trees, repeat=3, workDirectory=treesDirectory):
+    """cold and warm page cache throughput of HashDirectory and of a sequential read of the same files
+
+    Every cold run follows an eviction of all files of the tree, every warm run follows a run which read them.
+    Cold minus warm time is the I/O cost, warm read time the cost of copying the bytes, the rest is hashing.
+    """
+    report = {}
+    with wrapper.HashLibrary(libFullPath) as lib:
+        for treeName, profile in trees.items():
+            root = os.path.join(workDirectory, treeName)
+            manifest = corpus.generateCorpus(root, profile)
+            paths = [os.path.join(root, path) for path, size, md5 in manifest['entries']]
+            megabytes = manifest['bytes'] / 1e6
+            samples = {'hashCold': [], 'hashWarm': [], 'readCold': [], 'readWarm': []}
+            for _ in range(repeat):
+                evictFiles(paths)
+                samples['hashCold'].append(megabytes / measureHashRun(lib, root)[0])
+                samples['hashWarm'].append(megabytes / measureHashRun(lib, root)[0])
+                evictFiles(paths)
+                samples['readCold'].append(megabytes / measureSequentialRead(paths))
+                samples['readWarm'].append(megabytes / measureSequentialRead(paths))
+            report[treeName] = {
+                'files': manifest['files'],
+                'bytes': manifest['bytes'],
+                'MBps': {mode: percentiles(values) for mode, values in samples.items()}
+            }
+
+    print('\n{:14} {:>14} {:>14} {:>14} {:>14} {:>10}'.format(
+        'tree', 'hash cold MB/s', 'hash warm MB/s', 'read cold MB/s', 'read warm MB/s', 'I/O share'))
+    for treeName, tree in report.items():
+        p50 = {mode: summary['p50'] for mode, summary in tree['MBps'].items()}
+        # part of the cold run time not spent in the warm run
+        ioShare = 1 - p50['hashCold'] / p50['hashWarm'] if p50['hashWarm'] else 0.0
+        print('{:14} {:14.1f} {:14.1f} {:14.1f} {:14.1f} {:9.0%}'.format(
+            treeName, p50['hashCold'], p50['hashWarm'], p50['readCold'], p50['readWarm'], ioShare))
+    return report
+
+
+def pinProcess(cpus):
+    """restrict every thread of this process to cpus, threads started later inherit the mask"""
+    for task in os.listdir('/proc/self/task'):
+        try:
+            os.sched_setaffinity(int(task), cpus)
+        except (ProcessLookupError, PermissionError):
+            # thread ended meanwhile
+            pass
+
+
+def measureScalingRun(lib, directory, sampleInterval=0.01):
+    """one HashDirectory run - returns (wall seconds, process CPU seconds, peak thread count)"""
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    returnCode, opID = lib.directory(directory)
+    if returnCode != 0:
+        raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+    threads = leaktrack.procSample()[2]
+    nextSample = start + sampleInterval
+    for _ in waiter.iterResults(lib, opID):
+        now = time.perf_counter()
+        if now >= nextSample:
+            threads = max(threads, leaktrack.procSample()[2])
+            nextSample = now + sampleInterval
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    threads = max(threads, leaktrack.procSample()[2])
+    lib.stop(opID)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return elapsed, cpu, threads
+
+
+def amdahlFit(points):
+    """parallel fraction p of Amdahl's law T(n) = T(1) * ((1 - p) + p / n), least squares over 1 / n"""
+    if len(points) < 2:
+        return None
+    xs = [1.0 / point['cores'] for point in points]
+    ys = [point['wallSeconds'] / points[0]['wallSeconds'] for point in points]
+    meanX = sum(xs) / len(xs)
+    meanY = sum(ys) / len(ys)
+    denominator = sum((x - meanX) ** 2 for x in xs)
+    if not denominator:
+        return None
+    slope = sum((x - meanX) * (y - meanY) for x, y in zip(xs, ys)) / denominator
+    intercept = meanY - slope * meanX
+    # T(1) is not necessarily measured, the fit is normalized so that (1 - p) + p = 1
+    total = slope + intercept
+    return min(1.0, max(0.0, slope / total)) if total else None
+
+
+def coreCounts(available):
+    counts = []
+    count = 1
+    while count < available:
+        counts.append(count)
+        count *= 2
+    counts.append(available)
+    return counts
+
+
+def benchmarkScaling(libFullPath, treeName, profile, counts=None, repeat=3, workDirectory=treesDirectory):
+    """rerun HashDirectory on one tree with the process pinned to a growing number of cores
+
+    The library is initialized after pinning, so the threads it starts inherit the mask. Speedup and efficiency
+    are relative to the smallest core count, the serial fraction per row is the Karp-Flatt metric.
+    """
+    root = os.path.join(workDirectory, treeName)
+    manifest = corpus.generateCorpus(root, profile)
+    original = os.sched_getaffinity(0)
+    cpus = sorted(original)
+    counts = [count for count in (counts or coreCounts(len(cpus))) if count <= len(cpus)]
+    lib = wrapper.HashLibrary(libFullPath)
+    points = []
+    try:
+        for count in counts:
+            pinProcess(cpus[:count])
+            with lib:
+                measureScalingRun(lib, root)
+                runs = [measureScalingRun(lib, root) for _ in range(repeat)]
+            points.append({
+                'cores': count,
+                'wallSeconds': percentiles([run[0] for run in runs])['p50'],
+                'cpuSeconds': percentiles([run[1] for run in runs])['p50'],
+                'threads': max(run[2] for run in runs)
+            })
+    finally:
+        pinProcess(original)
+
+    base = points[0]
+    for point in points:
+        point['speedup'] = base['wallSeconds'] / point['wallSeconds']
+        point['efficiency'] = point['speedup'] * base['cores'] / point['cores']
+        relative = point['cores'] / base['cores']
+        point['serialFraction'] = ((1 / point['speedup'] - 1 / relative) / (1 - 1 / relative)
+                                   if relative > 1 else None)
+    parallelFraction = amdahlFit(points)
+    report = {
+        'tree': treeName,
+        'files': manifest['files'],
+        'bytes': manifest['bytes'],
+        'points': points,
+        'parallelFraction': parallelFraction,
+        'maxSpeedup': 1 / (1 - parallelFraction) if parallelFraction is not None and parallelFraction < 1 else None
+    }
+
+    print('\n{}, {} files, {:.1f} MB:'.format(treeName, manifest['files'], manifest['bytes'] / 1e6))
+    print('{:>6} {:>10} {:>10} {:>8} {:>8} {:>11} {:>8} {:>8}'.format(
+        'cores', 'wall s', 'cpu s', 'cpu/wall', 'threads', 'speedup', 'effic.', 'serial'))
+    for point in points:
+        print('{:6} {:10.3f} {:10.3f} {:8.2f} {:8} {:10.2f}x {:7.0%} {:>8}'.format(
+            point['cores'], point['wallSeconds'], point['cpuSeconds'], point['cpuSeconds'] / point['wallSeconds'],
+            point['threads'], point['speedup'], point['efficiency'],
+            '{:.3f}'.format(point['serialFraction']) if point['serialFraction'] is not None else '-'))
+    if parallelFraction is None:
+        print('parallel fraction: needs at least two core counts')
+    else:
+        print('parallel fraction {:.3f}, max speedup {}'.format(
+            parallelFraction, '{:.1f}x'.format(report['maxSpeedup']) if report['maxSpeedup'] else 'unbounded'))
+    return report
+
+
+def compareReports(report, baseline, threshold=0.1):
+    """compare p50 of every metric with the baseline, return list of regressions worse than threshold"""
+    regressions = []
+    for treeName, tree in report['trees'].items():
+        baseTree = baseline.get('trees', {}).get(treeName)
+        if baseTree is None:
+            continue
+        for metric, higherIsBetter in METRICS.items():
+            if metric not in tree['metrics'] or metric not in baseTree['metrics']:
+                continue
+            value = tree['metrics'][metric]['p50']
+            baseValue = baseTree['metrics'][metric]['p50']
+            if not baseValue:
+                continue
+            change = (value - baseValue) / baseValue
+            worse = -change if higherIsBetter else change
+            status = 'REGRESSION' if worse > threshold else 'ok'
+            print('{:14} {:18} {:14.2f} -> {:14.2f} {:+7.1f}% {}'.format(
+                treeName, metric, baseValue, value, 100 * change, status
+            ))
+            if worse > threshold:
+                regressions.append((treeName, metric, baseValue, value))
+    return regressions
+
+
+def selectTrees(names, files, size, depth, profileFile=corpus.PROFILE_FILE):
+    """{tree name: corpus profile} of the named profiles (corpus.defaultProfiles by default) or of one custom
+    uniform tree"""
+    if files is not None:
+        size = size or 0
+        depth = depth or 1
+        return {'custom-{}x{}-d{}'.format(files, size, depth): corpus.uniformProfile(files, size, depth)}
+    profiles = corpus.loadProfiles(profileFile)
+    if not names:
+        return corpus.defaultProfiles(profiles)
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise ValueError("unknown trees: {}, known trees: {}".format(', '.join(unknown), ', '.join(profiles)))
+    return {name: profiles[name] for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="microbenchmarks for the libhash wrapper")
+    parser.add_argument("--lib", default=inputLib, help="path to libhash.so")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    status = subparsers.add_parser("status", help="HashStatus per-call overhead, untyped vs HashLibrary")
+    status.add_argument("-n", "--iterations", type=int, default=100000)
+
+    md5 = subparsers.add_parser("md5", help="reference MD5 oracle throughput by worker count")
+    md5.add_argument("directory", nargs="?", default=inputDirectory)
+    md5.add_argument("-w", "--workers", type=int, nargs="+", help="worker counts to measure")
+    md5.add_argument("-c", "--chunk-size", type=int, default=oracle.CHUNK_SIZE)
+
+    suite = subparsers.add_parser("suite", help="throughput and latency suite on synthetic trees")
+    suite.add_argument("trees", nargs="*", help="corpus profiles to run, all but million-files and huge-files by "
+                                                "default")
+    suite.add_argument("--profile-file", default=corpus.PROFILE_FILE, help="JSON corpus profile file")
+    suite.add_argument("--files", type=int, help="file count of a custom tree instead of the predefined ones")
+    suite.add_argument("--size", type=int, help="file size in bytes of the custom tree")
+    suite.add_argument("--depth", type=int, help="nesting depth of the custom tree")
+    suite.add_argument("-r", "--repeat", type=int, default=5)
+    suite.add_argument("--work-dir", default=treesDirectory, help="where synthetic trees are generated")
+    suite.add_argument("-o", "--output", help="write the JSON report to this file")
+    suite.add_argument("--baseline", help="JSON report to compare with")
+    suite.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression, 0.1 = 10%%")
+
+    cache = subparsers.add_parser("cache", help="HashDirectory and sequential read throughput, cold vs warm page cache")
+    cache.add_argument("trees", nargs="*", default=["small-files", "medium-files"],
+                       help="corpus profiles to run, small-files and medium-files by default")
+    cache.add_argument("-r", "--repeat", type=int, default=3)
+    cache.add_argument("--work-dir", default=treesDirectory, help="where synthetic trees are generated")
+    cache.add_argument("-o", "--output", help="write the JSON report to this file")
+
+    scaling = subparsers.add_parser("scaling", help="HashDirectory speedup with the process pinned to 1, 2, 4 ... cores")
+    scaling.add_argument("tree", nargs="?", default="medium-files", help="corpus profile, medium-files by default")
+    scaling.add_argument("-c", "--cores", type=int, nargs="+", help="core counts, powers of two up to all by default")
+    scaling.add_argument("-r", "--repeat", type=int, default=3)
+    scaling.add_argument("--work-dir", default=treesDirectory, help="where synthetic trees are generated")
+    scaling.add_argument("-o", "--output", help="write the JSON report to this file")
+
+    logs = subparsers.add_parser("logging", help="per-record cost of the file and the queue log handler")
+    logs.add_argument("-n", "--records", type=int, default=20000)
+    logs.add_argument("--log-file", help="log to this file instead of a temporary one (e.g. on a slow disk)")
+
+    args = parser.parse_args(argv)
+    if args.benchmark == "logging":
+        benchmarkLogging(args.records, args.log_file)
+    elif args.benchmark == "suite":
+        try:
+            trees = selectTrees(args.trees, args.files, args.size, args.depth, args.profile_file)
+        except ValueError as e:
+            parser.error(str(e))
+        report = runSuite(args.lib, trees, args.repeat, workDirectory=args.work_dir)
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print('')
+        if args.baseline:
+            with open(args.baseline) as baselineFile:
+                regressions = compareReports(report, json.load(baselineFile), args.threshold)
+            if regressions:
+                print('{} regressions over {:.0%}'.format(len(regressions), args.threshold))
+                return 1
+        return 0
+    elif args.benchmark == "cache":
+        try:
+            trees = selectTrees(args.trees, None, None, None)
+        except ValueError as e:
+            parser.error(str(e))
+        report = benchmarkPageCache(args.lib, trees, args.repeat, args.work_dir)
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(report, output, indent=2)
+    elif args.benchmark == "scaling":
+        try:
+            trees = selectTrees([args.tree], None, None, None)
+        except ValueError as e:
+            parser.error(str(e))
+        report = benchmarkScaling(args.lib, args.tree, trees[args.tree], args.cores, args.repeat, args.work_dir)
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(report, output, indent=2)
+    elif args.benchmark == "status":
+        benchmarkStatusPolling(args.lib, args.iterations)
+    elif args.benchmark == "md5":
+        benchmarkOracle(args.directory, args.workers, args.chunk_size)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
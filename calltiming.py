@@ -0,0 +1,139 @@
+import time
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+TIMED_FUNCTIONS = ('HashInit', 'HashTerminate', 'HashDirectory', 'HashReadNextLogLine', 'HashStatus', 'HashStop',
+                   'HashFree')
+
+
+def percentiles(samples):
+    """summary of samples - min, p50, p90, p99, max and mean"""
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def percentile(p):
+        return ordered[min(count - 1, int(round(p / 100.0 * (count - 1))))]
+    return {
+        'min': ordered[0],
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': ordered[-1],
+        'mean': sum(ordered) / count,
+        'samples': count
+    }
+
+
+class LatencyHistogram(object):
+    """HDR-style log-linear histogram of non-negative integers (ns)
+
+    Every power of two is split into SUB_BUCKETS linear buckets, so recorded values keep a relative precision
+    of 1 / SUB_BUCKETS (6 %) over the whole range with a few hundred counters.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS * 2)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucketIndex(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def bucketValue(index):
+        """highest value falling into the bucket"""
+        if index < SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value):
+        index = self.bucketIndex(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0
+        rank = max(1, int(round(percent / 100.0 * self.count)))
+        seen = 0
+        for index, bucketCount in enumerate(self.counts):
+            seen += bucketCount
+            if seen >= rank:
+                return min(self.bucketValue(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'totalNs': self.total,
+            'meanNs': self.total / self.count if self.count else 0.0,
+            'p50Ns': self.percentile(50),
+            'p90Ns': self.percentile(90),
+            'p99Ns': self.percentile(99),
+            'p999Ns': self.percentile(99.9),
+            'maxNs': self.max
+        }
+
+
+class CallTimer(object):
+    """per-function latency histograms, call counts and return code counts of native libhash calls
+
+    instrument() replaces the function attributes of a loaded library (a ctypes CDLL or a HashLibrary) by
+    timing wrappers. Libraries which were never instrumented pay nothing.
+    """
+
+    def __init__(self):
+        self.histograms = {name: LatencyHistogram() for name in TIMED_FUNCTIONS}
+        self.returnCodes = {name: {} for name in TIMED_FUNCTIONS}
+
+    def instrument(self, library):
+        for name in TIMED_FUNCTIONS:
+            function = getattr(library, name)
+            if not getattr(function, 'timed', False):
+                setattr(library, name, self.wrap(name, function))
+        return library
+
+    def wrap(self, name, function):
+        record = self.histograms[name].record
+        returnCodes = self.returnCodes[name]
+        clock = time.perf_counter_ns
+
+        def timed(*args):
+            start = clock()
+            returnCode = function(*args)
+            record(clock() - start)
+            if returnCode is not None:
+                returnCodes[returnCode] = returnCodes.get(returnCode, 0) + 1
+            return returnCode
+        timed.timed = True
+        return timed
+
+    def snapshot(self, codeNames=None):
+        """{function: latency summary with calls and return code counts} of every function called so far"""
+        codeNames = codeNames or {}
+        snapshot = {}
+        for name, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            summary = histogram.summary()
+            summary['returnCodes'] = {codeNames.get(code, code): count
+                                      for code, count in sorted(self.returnCodes[name].items())}
+            snapshot[name] = summary
+        return snapshot
+
+    def reset(self):
+        for name in TIMED_FUNCTIONS:
+            self.histograms[name].__init__()
+            self.returnCodes[name].clear()
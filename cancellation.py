@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from calltiming import percentiles
+import corpus
+import hashresults
+import walker
+import wrapper
+
+AFTER_FILES = (1, 100, 1000)
+AFTER_MS = (0, 10, 100)
+REPEAT = 5
+POLL_INTERVAL = 100e-6
+# the log is considered quiescent when no line arrived for this long
+QUIET_PERIOD = 20e-3
+DEFAULT_TREES = ('small-files', 'medium-files')
+
+
+def stopOperation(library, opID, expected, normalize=None, afterFiles=None, afterMs=None, quietPeriod=QUIET_PERIOD):
+    """stop a running operation after afterFiles log lines or afterMs ms, measure how fast it stops and check
+    the partial result against expected {relative path: digest}
+
+    Works with a library from wrapper.loadHashLibrary as well as with wrapper.HashLibrary. Times are in ns from
+    the HashStop call - stopCallNs its duration, quiescentNs until the log stopped growing (the last line which
+    arrived afterwards, at least the end of the call). HashStatus can not tell when the work stopped, HashStop
+    frees the operation ID. The partial result is consistent when it has no duplicate, unexpected, malformed or
+    wrong digest lines, files not hashed before the stop are expected.
+    """
+    clock = time.perf_counter_ns
+    results = hashresults.HashResults()
+    poll = wrapper.statusPoller(library, opID)
+    deadline = clock() + int(afterMs * 1e6) if afterMs is not None else None
+
+    # only lines of opID are taken from the shared log, other operations keep theirs
+    demultiplexer = wrapper.logDemultiplexer(library)
+    demultiplexer.register(opID, results.appendLogLine)
+    try:
+        finishedEarly = False
+        while True:
+            demultiplexer.drain()
+            # polled before the stop points, an operation which already ended is never counted as stopped
+            returnCode, running = poll()
+            if returnCode != 0 or not running:
+                finishedEarly = True
+                break
+            if afterFiles is not None and len(results) >= afterFiles:
+                break
+            if deadline is not None and clock() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+        linesBeforeStop = len(results)
+
+        stopStart = clock()
+        stopReturnCode = library.HashStop(opID)
+        stopCallNs = clock() - stopStart
+
+        lastLineNs = stopCallNs
+        quietSince = clock()
+        while clock() - quietSince < quietPeriod * 1e9:
+            lines = len(results)
+            demultiplexer.drain()
+            if len(results) > lines:
+                quietSince = clock()
+                lastLineNs = quietSince - stopStart
+            else:
+                time.sleep(POLL_INTERVAL)
+    finally:
+        demultiplexer.unregister(opID)
+
+    missing, unexpected, mismatched = results.compare(expected, normalize)
+    duplicates = results.duplicatePaths()
+    return {
+        'afterFiles': afterFiles,
+        'afterMs': afterMs,
+        'stopReturnCode': stopReturnCode,
+        'finishedEarly': finishedEarly,
+        'linesBeforeStop': linesBeforeStop,
+        'linesAfterStop': len(results) - linesBeforeStop,
+        'stopCallNs': stopCallNs,
+        'quiescentNs': lastLineNs,
+        'notHashed': len(missing),
+        'unexpected': unexpected,
+        'mismatched': mismatched,
+        'duplicates': duplicates,
+        'malformed': results.malformed,
+        'consistent': not unexpected and not mismatched and not duplicates and not results.malformed
+    }
+
+
+def runCancellation(libFullPath, trees, afterFiles=AFTER_FILES, afterMs=AFTER_MS, repeat=REPEAT,
+                    workDirectory=corpus.CORPUS_DIRECTORY):
+    """stop operations on corpus trees at every stop point repeat times, return a JSON-serializable report"""
+    stopPoints = [(count, None) for count in afterFiles] + [(None, milliseconds) for milliseconds in afterMs]
+    report = {'library': os.path.abspath(libFullPath), 'trees': {}}
+    with wrapper.HashLibrary(libFullPath) as lib:
+        for treeName, profile in trees.items():
+            root = os.path.join(workDirectory, treeName)
+            expected = corpus.expectedDigests(corpus.generateCorpus(root, profile))
+
+            def normalize(path):
+                return walker.normalizePath(path, root)
+
+            points = []
+            for count, milliseconds in stopPoints:
+                runs = []
+                for _ in range(repeat):
+                    returnCode, opID = lib.directory(root)
+                    if returnCode != 0:
+                        raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+                    runs.append(stopOperation(lib, opID, expected, normalize, count, milliseconds))
+                points.append({
+                    'afterFiles': count,
+                    'afterMs': milliseconds,
+                    'finishedEarly': sum(run['finishedEarly'] for run in runs),
+                    'inconsistent': sum(not run['consistent'] for run in runs),
+                    'stopErrors': sum(run['stopReturnCode'] != 0 for run in runs),
+                    'linesAfterStop': percentiles([run['linesAfterStop'] for run in runs]),
+                    'stopCallMs': percentiles([run['stopCallNs'] / 1e6 for run in runs]),
+                    'quiescentMs': percentiles([run['quiescentNs'] / 1e6 for run in runs]),
+                    'runs': runs
+                })
+            report['trees'][treeName] = {'files': len(expected), 'points': points}
+    return report
+
+
+def printReport(report):
+    print('\n{:14} {:>14} {:>12} {:>14} {:>10} {:>6} {:>12}'.format(
+        'tree', 'stop after', 'call p99 ms', 'quiet p99 ms', 'lines p99', 'early', 'inconsistent'))
+    for treeName, tree in report['trees'].items():
+        for point in tree['points']:
+            stopPoint = ('{} files'.format(point['afterFiles']) if point['afterFiles'] is not None
+                         else '{} ms'.format(point['afterMs']))
+            print('{:14} {:>14} {:12.3f} {:14.3f} {:10.0f} {:6} {:12}'.format(
+                treeName, stopPoint, point['stopCallMs']['p99'], point['quiescentMs']['p99'],
+                point['linesAfterStop']['p99'], point['finishedEarly'], point['inconsistent']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HashStop cancellation latency and partial result consistency")
+    parser.add_argument("trees", nargs="*", help="corpus profiles to run, {} by default".format(
+        ', '.join(DEFAULT_TREES)))
+    parser.add_argument("--lib", default=wrapper.defaultLibraryPath(), help="path to libhash.so")
+    parser.add_argument("--after-files", type=int, nargs="*", default=list(AFTER_FILES),
+                        help="stop after this many log lines")
+    parser.add_argument("--after-ms", type=float, nargs="*", default=list(AFTER_MS),
+                        help="stop this many ms after HashDirectory")
+    parser.add_argument("-r", "--repeat", type=int, default=REPEAT)
+    parser.add_argument("--work-dir", default=corpus.CORPUS_DIRECTORY, help="where corpus trees are generated")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    profiles = corpus.loadProfiles()
+    names = args.trees or DEFAULT_TREES
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        parser.error("unknown trees: {}, known trees: {}".format(', '.join(unknown), ', '.join(profiles)))
+
+    report = runCancellation(args.lib, {name: profiles[name] for name in names}, args.after_files, args.after_ms,
+                             args.repeat, args.work_dir)
+    printReport(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            # paths and malformed lines of inconsistent runs are bytes
+            json.dump(report, output, indent=2, default=os.fsdecode)
+    inconsistent = sum(point['inconsistent'] for tree in report['trees'].values() for point in tree['points'])
+    if inconsistent:
+        print('{} stopped operations left an inconsistent log'.format(inconsistent))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import oracle
+
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus_profiles.json')
+CORPUS_DIRECTORY = './bench_trees'
+CORPUS_ENV = 'HASH_CORPUS'
+MANIFEST_SUFFIX = '.manifest.json'
+# marker of trees written by the former benchmark generator, such trees are regenerated
+LEGACY_MARKER = '.complete'
+BLOCK_SIZE = 1 << 20
+HEADER_SIZE = 16
+NAME_MAX = 255
+LONG_DIRECTORY_NAME = 200
+FANOUT = 4
+NAME_POLICIES = ('plain', 'unicode', 'long', 'spaces')
+UNICODE_PREFIXES = ('файл', 'αρχείο', '文件', 'ファイル', 'datei-äöü', 'café', 'emoji-🙂', 'קובץ')
+
+ZEROS = bytes(BLOCK_SIZE)
+
+
+def loadProfiles(profileFile=PROFILE_FILE):
+    """{profile name: profile} from a JSON profile file"""
+    with open(profileFile, encoding='utf-8') as profiles:
+        profiles = json.load(profiles)
+    for name, profile in profiles.items():
+        validateProfile(name, profile)
+    return profiles
+
+
+def defaultProfiles(profiles):
+    """profiles used when none is named - the ones marked "default": false (a million files, files of several GB)
+    take long to generate and are only used on request"""
+    return {name: profile for name, profile in profiles.items() if profile.get('default', True)}
+
+
+def uniformProfile(files, size=0, depth=1):
+    """profile of one group of equally sized files"""
+    return {'groups': [{'files': files, 'size': size, 'depth': depth}]}
+
+
+def validateProfile(name, profile):
+    groups = profile.get('groups')
+    if not groups:
+        raise ValueError("profile {} has no groups".format(name))
+    for group in groups:
+        size = group.get('size', 0)
+        sizes = size if isinstance(size, list) else [size, size]
+        if group.get('files', 0) < 0 or len(sizes) != 2 or not 0 <= sizes[0] <= sizes[1]:
+            raise ValueError("profile {} - invalid file count or size: {}".format(name, group))
+        if group.get('depth', 1) < 1:
+            raise ValueError("profile {} - depth must be 1 or more: {}".format(name, group))
+        if group.get('names', 'plain') not in NAME_POLICIES:
+            raise ValueError("profile {} - unknown names policy {}, known policies: {}".format(
+                name, group.get('names'), ', '.join(NAME_POLICIES)))
+
+
+def fileName(index, names):
+    if names == 'unicode':
+        return '{}-{:07d}.bin'.format(UNICODE_PREFIXES[index % len(UNICODE_PREFIXES)], index)
+    if names == 'spaces':
+        return 'file {:07d} with spaces.bin'.format(index)
+    if names == 'long':
+        name = 'f{:07d}-'.format(index)
+        return name + 'x' * (NAME_MAX - len(name) - len('.bin')) + '.bin'
+    return 'f{:07d}.bin'.format(index)
+
+
+def directoryName(value, names):
+    name = 'd{}'.format(value)
+    if names == 'long':
+        return name + '-' + 'y' * (LONG_DIRECTORY_NAME - len(name) - 1)
+    return name
+
+
+def plan(profile, seed=0):
+    """yield (relativePath, size, sparse, groupIndex, fileNumber) of every file of profile
+
+    File sizes drawn from a [min, max] range depend on the seed only, so a profile and a seed always describe
+    the same tree. Groups of a profile with more than one group are placed in directories g0, g1, ...
+    """
+    groups = profile['groups']
+    fileNumber = 0
+    for groupIndex, group in enumerate(groups):
+        prefix = 'g{}'.format(groupIndex) if len(groups) > 1 else ''
+        size = group.get('size', 0)
+        low, high = size if isinstance(size, list) else (size, size)
+        depth = group.get('depth', 1)
+        fanout = group.get('fanout', FANOUT)
+        names = group.get('names', 'plain')
+        sizes = random.Random('{}:{}:sizes'.format(seed, groupIndex))
+        for index in range(group['files']):
+            parts = [prefix] if prefix else []
+            value = index
+            for _ in range(depth - 1):
+                parts.append(directoryName(value % fanout, names))
+                value //= fanout
+            parts.append(fileName(index, names))
+            yield '/'.join(parts), sizes.randint(low, high), bool(group.get('sparse')), groupIndex, fileNumber
+            fileNumber += 1
+
+
+def groupBlocks(profile, seed=0):
+    """per group random block repeated as file content, up to BLOCK_SIZE bytes"""
+    blocks = []
+    for groupIndex, group in enumerate(profile['groups']):
+        size = group.get('size', 0)
+        high = size[1] if isinstance(size, list) else size
+        length = 0 if group.get('sparse') else min(high, BLOCK_SIZE)
+        blocks.append(random.Random('{}:{}'.format(seed, groupIndex)).randbytes(length))
+    return blocks
+
+
+def writeFile(path, size, sparse, header, block):
+    """write one file, return its MD5 hex digest computed from the written data
+
+    Content is header (unique per file) followed by block repeated. Sparse files are a hole of size bytes with
+    the header at both ends, other files larger than one block are preallocated with posix_fallocate first.
+    """
+    md5 = hashlib.md5()
+    head = header[:size]
+    with open(path, 'wb') as output:
+        if sparse:
+            fd = output.fileno()
+            os.ftruncate(fd, size)
+            tail = header[:min(len(header), size - len(head))]
+            os.pwrite(fd, head, 0)
+            if tail:
+                os.pwrite(fd, tail, size - len(tail))
+            md5.update(head)
+            zeros = size - len(head) - len(tail)
+            while zeros > 0:
+                chunk = min(zeros, BLOCK_SIZE)
+                md5.update(ZEROS[:chunk] if chunk < BLOCK_SIZE else ZEROS)
+                zeros -= chunk
+            md5.update(tail)
+            return md5.hexdigest()
+
+        if size > len(block) and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(output.fileno(), 0, size)
+            except OSError:
+                # not supported by the file system, the file is allocated by the writes
+                pass
+        chunk = (head + block[len(head):])[:size]
+        remaining = size
+        while remaining > 0:
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            output.write(chunk)
+            md5.update(chunk)
+            remaining -= len(chunk)
+            chunk = block
+    return md5.hexdigest()
+
+
+def manifestPath(root):
+    return os.path.normpath(root) + MANIFEST_SUFFIX
+
+
+def loadManifest(root):
+    """manifest of a tree generated under root, None when there is none"""
+    try:
+        with open(manifestPath(root), encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+def expectedDigests(manifest):
+    """{relative path (bytes, as yielded by walker.walk): 16 byte digest} of a manifest"""
+    return {os.fsencode(path): bytes.fromhex(md5) for path, size, md5 in manifest['entries']}
+
+
+def generateCorpus(root, profile, seed=0, workers=None):
+    """build the tree of profile and seed under root unless it is already there, return its manifest
+
+    Files are written by a thread pool, their MD5 digests are computed from the written data and stored in the
+    manifest next to root (<root>.manifest.json), so expected digests never need reading the tree again.
+    A tree generated from another profile or seed is replaced, any other existing content of root is an error.
+    """
+    manifest = loadManifest(root)
+    if manifest is not None and manifest['profile'] == profile and manifest['seed'] == seed:
+        return manifest
+    if manifest is not None:
+        os.remove(manifestPath(root))
+        shutil.rmtree(root, ignore_errors=True)
+    elif os.path.exists(os.path.join(root, LEGACY_MARKER)):
+        shutil.rmtree(root)
+    elif os.path.isdir(root) and os.listdir(root):
+        raise FileExistsError("{} exists and was not generated by corpus".format(root))
+
+    files = list(plan(profile, seed))
+    blocks = groupBlocks(profile, seed)
+    for directory in {os.path.dirname(relativePath) for relativePath, *_ in files}:
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+
+    def write(spec):
+        relativePath, size, sparse, groupIndex, fileNumber = spec
+        header = '{:08x}{:08x}'.format(seed & 0xffffffff, fileNumber).encode('ascii')
+        return writeFile(os.path.join(root, relativePath), size, sparse, header, blocks[groupIndex])
+
+    with ThreadPoolExecutor(workers or oracle.defaultWorkers()) as executor:
+        digests = list(executor.map(write, files))
+
+    manifest = {
+        'profile': profile,
+        'seed': seed,
+        'files': len(files),
+        'bytes': sum(size for _, size, *_ in files),
+        'entries': [[relativePath, size, md5] for (relativePath, size, *_), md5 in zip(files, digests)]
+    }
+    temporary = manifestPath(root) + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporary, manifestPath(root))
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="generate synthetic fixture trees with precomputed MD5 manifests")
+    parser.add_argument("profiles", nargs="*", help="profiles to generate, all but the ones marked \"default\": "
+                                                    "false by default")
+    parser.add_argument("--profile-file", default=PROFILE_FILE, help="JSON profile file")
+    parser.add_argument("--root", default=CORPUS_DIRECTORY, help="trees are generated in <root>/<profile>")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-w", "--workers", type=int, help="parallel writers")
+    parser.add_argument("-l", "--list", action="store_true", help="list the profiles and exit")
+    args = parser.parse_args(argv)
+
+    profiles = loadProfiles(args.profile_file)
+    if args.list:
+        for name, profile in profiles.items():
+            files = sum(group['files'] for group in profile['groups'])
+            print('{:16} {:8} files in {} groups{}'.format(name, files, len(profile['groups']),
+                                                          '' if profile.get('default', True) else ', on request'))
+        return 0
+    unknown = [name for name in args.profiles if name not in profiles]
+    if unknown:
+        parser.error("unknown profiles: {}, known profiles: {}".format(', '.join(unknown), ', '.join(profiles)))
+
+    for name in args.profiles or defaultProfiles(profiles):
+        start = time.perf_counter()
+        manifest = generateCorpus(os.path.join(args.root, name), profiles[name], args.seed, args.workers)
+        elapsed = time.perf_counter() - start
+        print('{:16} {:8} files {:12.1f} MB {:8.2f} s'.format(name, manifest['files'], manifest['bytes'] / 1e6,
+                                                                elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+
+import oracle
+
+CACHE_FILE = ".digest_cache.sqlite3"
+MAX_ENTRIES = 1000000
+
+# generation of this run by absolute cache file path, the first open of a cache file in a run starts a new
+# generation, later opens reuse it. A run is a process and the workers it spawns, they inherit the generations
+# through GENERATIONS_ENV.
+GENERATIONS_ENV = 'HASH_CACHE_GENERATIONS'
+runGenerations = json.loads(os.environ.get(GENERATIONS_ENV, '{}'))
+
+
+def setRunGeneration(generationKey, generation):
+    runGenerations[generationKey] = generation
+    os.environ[GENERATIONS_ENV] = json.dumps(runGenerations)
+
+
+def startRun(cacheFile=CACHE_FILE):
+    """start the generation of this run in cacheFile unless it has one, call before spawning workers"""
+    DigestCache(cacheFile).close()
+
+
+class DigestCache(object):
+    """on-disk cache of reference MD5 digests keyed by (device, inode, size, mtime_ns)
+
+    A file whose stat key did not change is never read again. Entries carry the generation (number of the
+    run, see runGenerations) in which they were last used, when the cache holds more than maxEntries entries
+    the least recently used are evicted on close. Counters of hits and misses are kept per instance.
+    """
+
+    def __init__(self, cacheFile=CACHE_FILE, maxEntries=MAX_ENTRIES):
+        self.cacheFile = cacheFile
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(cacheFile)
+        self.connection.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS digests (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                digest BLOB NOT NULL,
+                generation INTEGER NOT NULL,
+                PRIMARY KEY (device, inode, size, mtime)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS digests_generation ON digests (generation);
+            CREATE TABLE IF NOT EXISTS meta (generation INTEGER NOT NULL);
+        ''')
+        generationKey = os.path.abspath(cacheFile)
+        row = self.connection.execute('SELECT generation FROM meta').fetchone()
+        if row is None:
+            self.generation = 1
+            setRunGeneration(generationKey, self.generation)
+            self.connection.execute('INSERT INTO meta VALUES (1)')
+        elif generationKey in runGenerations and runGenerations[generationKey] == row[0]:
+            self.generation = row[0]
+        else:
+            self.generation = row[0] + 1
+            setRunGeneration(generationKey, self.generation)
+            self.connection.execute('UPDATE meta SET generation = ?', (self.generation,))
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM digests').fetchone()[0]
+
+    @staticmethod
+    def statKey(path):
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def md5Files(self, paths, workers=None, chunkSize=oracle.CHUNK_SIZE, mmapThreshold=oracle.MMAP_THRESHOLD):
+        """reference digests of paths, {path: digest}, only files missing in the cache are read"""
+        digests = {}
+        missing = {}
+        used = []
+        select = 'SELECT digest FROM digests WHERE device = ? AND inode = ? AND size = ? AND mtime = ?'
+        execute = self.connection.execute
+        for path in paths:
+            key = self.statKey(path)
+            row = execute(select, key).fetchone()
+            if row is None:
+                missing[path] = key
+            else:
+                digests[path] = row[0]
+                used.append(key)
+        self.hits += len(used)
+        self.misses += len(missing)
+
+        computed = oracle.md5Files(missing, workers, chunkSize, mmapThreshold) if missing else {}
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE digests SET generation = ? WHERE device = ? AND inode = ? AND size = ? AND mtime = ?',
+                [(self.generation,) + key for key in used]
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)',
+                [key + (computed[path], self.generation) for path, key in missing.items()]
+            )
+        digests.update(computed)
+        return digests
+
+    def md5Directory(self, directory, recursive=False, workers=None):
+        return self.md5Files(oracle.listFiles(directory, recursive), workers)
+
+    def evict(self):
+        """drop least recently used entries above maxEntries, return count of dropped entries"""
+        excess = len(self) - self.maxEntries
+        if excess <= 0:
+            return 0
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM digests WHERE (device, inode, size, mtime) IN '
+                '(SELECT device, inode, size, mtime FROM digests ORDER BY generation LIMIT ?)', (excess,)
+            )
+        return excess
+
+    def invalidate(self):
+        """drop all cached digests"""
+        with self.connection:
+            self.connection.execute('DELETE FROM digests')
+
+    def close(self):
+        if self.connection is None:
+            return
+        self.evict()
+        self.connection.close()
+        self.connection = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRatio': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+import argparse
+import ctypes
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing.connection import wait
+
+import hashresults
+import wrapper
+
+OK = 0
+LOG_EMPTY = 4
+ARGUMENT_INVALID = 5
+ARGUMENT_NULL = 6
+NOT_INITIALIZED = 7
+ALREADY_INITIALIZED = 8
+
+ACTIONS = ('init', 'terminate', 'directory', 'status', 'read', 'stop')
+WEIGHTS = (15, 10, 20, 20, 20, 15)
+# HashDirectory arguments - an existing directory, a file, a missing path, NULL path, NULL id pointer
+DIRECTORY_ARGUMENTS = ('valid', 'file', 'missing', 'null', 'nullID')
+# operation IDs - running or finished operation, stopped operation (or one of an earlier session), never issued
+ID_KINDS = ('active', 'stopped', 'bogus')
+BOGUS_ID = 1 << 62
+MAX_STEPS = 20
+DURATION = 10.0
+PROGRESS_EVERY = 0.2
+HANG_TIMEOUT = 10.0
+
+
+class HashModel(object):
+    """reference state model of hash.h - expected return codes of a call in the current state
+
+    expected() returns the set of acceptable return codes, a call with several argument errors may report any
+    of them. update() applies a call and its actual return code to the state.
+    """
+
+    def __init__(self):
+        self.initialized = False
+        self.active = []
+        self.stopped = []
+        self.issued = set()
+
+    def resolve(self, idKind, index):
+        if idKind == 'active' and self.active:
+            return self.active[index % len(self.active)]
+        if idKind == 'stopped' and self.stopped:
+            return self.stopped[index % len(self.stopped)]
+        return BOGUS_ID + index
+
+    def expected(self, action, opID=None):
+        kind = action[0]
+        if kind == 'init':
+            return {ALREADY_INITIALIZED} if self.initialized else {OK}
+        if kind == 'terminate':
+            return {OK} if self.initialized else {NOT_INITIALIZED}
+        if kind == 'directory':
+            argument = action[1]
+            codes = set() if self.initialized else {NOT_INITIALIZED}
+            if argument in ('null', 'nullID'):
+                codes.add(ARGUMENT_NULL)
+            elif self.initialized:
+                codes.add(OK if argument == 'valid' else ARGUMENT_INVALID)
+            return codes
+        if kind == 'read':
+            codes = set() if self.initialized else {NOT_INITIALIZED}
+            if action[1]:
+                codes.add(ARGUMENT_NULL)
+            elif self.initialized:
+                # operations run in parallel, any session with an operation may have lines waiting
+                codes.update({OK, LOG_EMPTY} if self.issued else {LOG_EMPTY})
+            return codes
+        if kind == 'status':
+            codes = set() if self.initialized else {NOT_INITIALIZED}
+            if action[3]:
+                codes.add(ARGUMENT_NULL)
+            elif self.initialized:
+                codes.add(OK if opID in self.active else ARGUMENT_INVALID)
+            return codes
+        if kind == 'stop':
+            if not self.initialized:
+                # test13 expects ARGUMENT_INVALID for an ID of a terminated session, hash.h NOT_INITIALIZED
+                return {NOT_INITIALIZED, ARGUMENT_INVALID}
+            return {OK} if opID in self.active else {ARGUMENT_INVALID}
+        raise ValueError("unknown action: {}".format(kind))
+
+    def update(self, action, returnCode, opID=None):
+        kind = action[0]
+        if returnCode != OK:
+            return
+        if kind == 'init':
+            self.initialized = True
+        elif kind == 'terminate':
+            self.initialized = False
+            self.stopped.extend(self.active)
+            self.active = []
+        elif kind == 'directory':
+            if opID in self.stopped:
+                self.stopped.remove(opID)
+            self.active.append(opID)
+            self.issued.add(opID)
+        elif kind == 'stop':
+            self.active.remove(opID)
+            self.stopped.append(opID)
+
+
+def randomAction(rng):
+    kind = rng.choices(ACTIONS, WEIGHTS)[0]
+    if kind == 'directory':
+        return (kind, rng.choice(DIRECTORY_ARGUMENTS))
+    if kind == 'read':
+        return (kind, rng.random() < 0.1)
+    if kind in ('status', 'stop'):
+        return (kind, rng.choice(ID_KINDS), rng.randrange(8), kind == 'status' and rng.random() < 0.1)
+    return (kind,)
+
+
+def randomSequence(rng, maxSteps=MAX_STEPS):
+    return [randomAction(rng) for _ in range(rng.randint(1, maxSteps))]
+
+
+def sequenceSeed(seed, worker, counter):
+    return '{}:{}:{}'.format(seed, worker, counter)
+
+
+def describe(action, opID=None):
+    kind = action[0]
+    if kind == 'init':
+        return 'HashInit()'
+    if kind == 'terminate':
+        return 'HashTerminate()'
+    if kind == 'directory':
+        return 'HashDirectory(<{}>)'.format(action[1])
+    if kind == 'read':
+        return 'HashReadNextLogLine({})'.format('NULL' if action[1] else '&line')
+    operation = '<{} #{}>'.format(action[1], action[2]) + (' = {}'.format(opID) if opID is not None else '')
+    if kind == 'status':
+        return 'HashStatus({}, {})'.format(operation, 'NULL' if action[3] else '&running')
+    return 'HashStop({})'.format(operation)
+
+
+def runSequence(lib, sequence, fixtures):
+    """run one call sequence against the model, return None or the first mismatch as a dict
+
+    The library is terminated afterwards when the model holds it initialized, so the next sequence starts from
+    a fresh library state.
+    """
+    model = HashModel()
+    opID = ctypes.c_size_t(0)
+    running = ctypes.c_bool(False)
+    logLine = ctypes.c_char_p()
+    failure = None
+    for step, action in enumerate(sequence):
+        kind = action[0]
+        callID = None
+        if kind == 'init':
+            returnCode = lib.HashInit()
+        elif kind == 'terminate':
+            returnCode = lib.HashTerminate()
+        elif kind == 'directory':
+            path = fixtures.get(action[1])
+            returnCode = lib.HashDirectory(path, None if action[1] == 'nullID' else ctypes.byref(opID))
+            callID = opID.value
+        elif kind == 'read':
+            returnCode = lib.HashReadNextLogLine(None if action[1] else ctypes.byref(logLine))
+            if returnCode == OK and not action[1]:
+                line = logLine.value
+                lib.HashFree(logLine)
+                try:
+                    lineID = hashresults.parseLogLine(line)[0]
+                except ValueError:
+                    lineID = None
+                if lineID not in model.issued:
+                    failure = {'step': step, 'call': describe(action), 'error': 'unexpected log line',
+                               'line': repr(line)}
+                    break
+        else:
+            callID = model.resolve(action[1], action[2])
+            if kind == 'status':
+                returnCode = lib.HashStatus(callID, None if action[3] else ctypes.byref(running))
+            else:
+                returnCode = lib.HashStop(callID)
+
+        expected = model.expected(action, callID)
+        if returnCode not in expected:
+            failure = {'step': step, 'call': describe(action, callID), 'error': 'unexpected return code',
+                       'expected': sorted(wrapper.ReturnCodes.get(code, code) for code in expected),
+                       'actual': wrapper.ReturnCodes.get(returnCode, returnCode)}
+            break
+        if kind == 'directory' and returnCode == OK and callID in model.active:
+            failure = {'step': step, 'call': describe(action, callID), 'error': 'operation ID already in use'}
+            break
+        model.update(action, returnCode, callID)
+    if model.initialized:
+        lib.HashTerminate()
+    return failure
+
+
+def makeFixtures():
+    """temporary directory tree for HashDirectory arguments, returns (directory to remove, {argument: path})"""
+    directory = tempfile.mkdtemp(prefix='hashfuzz')
+    valid = os.path.join(directory, 'valid')
+    os.mkdir(valid)
+    for index in range(2):
+        with open(os.path.join(valid, 'f{}.bin'.format(index)), 'wb') as output:
+            output.write(os.urandom(64))
+    return directory, {
+        'valid': os.fsencode(valid),
+        'file': os.fsencode(os.path.join(valid, 'f0.bin')),
+        'missing': os.fsencode(os.path.join(directory, 'missing')),
+        'null': None,
+        'nullID': os.fsencode(valid)
+    }
+
+
+def fuzzWorker(lib, fixtures, seed, worker, deadline, maxSequences, maxSteps, counter, connection):
+    """forked worker - random sequences until deadline or maxSequences, reports progress and the first failure"""
+    sequences = 0
+    steps = 0
+    lastReport = time.monotonic()
+    while time.monotonic() < deadline and (maxSequences is None or sequences < maxSequences):
+        counter.value = sequences
+        sequence = randomSequence(random.Random(sequenceSeed(seed, worker, sequences)), maxSteps)
+        failure = runSequence(lib, sequence, fixtures)
+        sequences += 1
+        steps += len(sequence)
+        if failure is not None:
+            connection.send(('failed', sequences, steps, sequence, failure))
+            return
+        now = time.monotonic()
+        if now - lastReport >= PROGRESS_EVERY:
+            connection.send(('progress', sequences, steps))
+            lastReport = now
+    connection.send(('done', sequences, steps))
+
+
+def isolatedWorker(lib, fixtures, sequence, connection):
+    connection.send(runSequence(lib, sequence, fixtures))
+
+
+def runIsolated(context, lib, fixtures, sequence, timeout=HANG_TIMEOUT):
+    """run one sequence in a freshly forked child of the pre-loaded process, a hang or a crash is a failure"""
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=isolatedWorker, args=(lib, fixtures, sequence, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            process.kill()
+            process.join()
+            return {'error': 'hang', 'timeout': timeout}
+        return receiver.recv()
+    except EOFError:
+        process.join()
+        return {'error': 'crash', 'exitcode': process.exitcode}
+    finally:
+        process.join(1)
+        receiver.close()
+
+
+def failureSignature(failure):
+    return failure['error'], failure.get('call', '').split('(')[0]
+
+
+def shrink(context, lib, fixtures, sequence, failure):
+    """minimal sequence reproducing a failure of the same kind on the same function, returns (sequence, failure)
+
+    Chunks of steps are removed while the failure persists (halving the chunk size when nothing can be
+    removed), then operation ID indexes are reset to 0. Every candidate runs in its own forked child.
+    """
+    signature = failureSignature(failure)
+    best = list(sequence)
+    if 'step' in failure:
+        best = best[:failure['step'] + 1]
+
+    def reproduces(candidate):
+        result = runIsolated(context, lib, fixtures, candidate)
+        if candidate and result is not None and failureSignature(result) == signature:
+            return result
+        return None
+
+    chunk = max(1, len(best) // 2)
+    while True:
+        index = 0
+        removed = False
+        while index < len(best):
+            candidate = best[:index] + best[index + chunk:]
+            result = reproduces(candidate)
+            if result is not None:
+                best, failure, removed = candidate, result, True
+            else:
+                index += chunk
+        if not removed:
+            if chunk == 1:
+                break
+            chunk //= 2
+    for index, action in enumerate(best):
+        if action[0] in ('status', 'stop') and action[2]:
+            candidate = best[:index] + [action[:2] + (0,) + action[3:]] + best[index + 1:]
+            result = reproduces(candidate)
+            if result is not None:
+                best, failure = candidate, result
+    return best, failure
+
+
+def runFuzzer(libFullPath, duration=DURATION, workers=None, seed=0, maxSequences=None, maxSteps=MAX_STEPS):
+    """fuzz with forked workers of one process holding the loaded library, return a JSON-serializable report"""
+    context = multiprocessing.get_context('fork')
+    lib = wrapper.HashLibrary(libFullPath)
+    fixtureDirectory, fixtures = makeFixtures()
+    workers = workers or os.cpu_count() or 1
+    perWorker = None if maxSequences is None else max(1, maxSequences // workers)
+    start = time.monotonic()
+    deadline = start + duration
+    running = {}
+    failures = []
+    sequences = 0
+    steps = 0
+    try:
+        for worker in range(workers):
+            receiver, sender = context.Pipe(duplex=False)
+            counter = context.Value('Q', 0, lock=False)
+            process = context.Process(target=fuzzWorker, args=(lib, fixtures, seed, worker, deadline, perWorker,
+                                                               maxSteps, counter, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = [worker, process, counter, 0, 0, time.monotonic()]
+
+        while running:
+            ready = wait(list(running), timeout=PROGRESS_EVERY)
+            now = time.monotonic()
+            for receiver in ready:
+                state = running[receiver]
+                worker, process, counter = state[:3]
+                try:
+                    message = receiver.recv()
+                except EOFError:
+                    message = ('crashed',)
+                if message[0] in ('progress', 'done', 'failed'):
+                    state[3], state[4], state[5] = message[1], message[2], now
+                if message[0] == 'progress':
+                    continue
+                if message[0] == 'failed':
+                    failures.append((message[3], message[4]))
+                elif message[0] == 'crashed':
+                    process.join()
+                    sequence = randomSequence(random.Random(sequenceSeed(seed, worker, counter.value)), maxSteps)
+                    failures.append((sequence, {'error': 'crash', 'exitcode': process.exitcode}))
+                process.join()
+                sequences += state[3]
+                steps += state[4]
+                del running[receiver]
+                receiver.close()
+            for receiver, state in list(running.items()):
+                worker, process, counter = state[:3]
+                if now - state[5] > HANG_TIMEOUT:
+                    process.kill()
+                    process.join()
+                    sequence = randomSequence(random.Random(sequenceSeed(seed, worker, counter.value)), maxSteps)
+                    failures.append((sequence, {'error': 'hang', 'timeout': HANG_TIMEOUT}))
+                    sequences += state[3]
+                    steps += state[4]
+                    del running[receiver]
+                    receiver.close()
+        elapsed = time.monotonic() - start
+
+        reproducers = []
+        for sequence, failure in failures:
+            shrunk, shrunkFailure = shrink(context, lib, fixtures, sequence, failure)
+            reproducers.append({
+                'failure': shrunkFailure,
+                'original': len(sequence),
+                'sequence': [describe(action) for action in shrunk],
+                'actions': shrunk
+            })
+    finally:
+        shutil.rmtree(fixtureDirectory, ignore_errors=True)
+    return {
+        'library': os.path.abspath(libFullPath),
+        'seed': seed,
+        'workers': workers,
+        'seconds': elapsed,
+        'sequences': sequences,
+        'steps': steps,
+        'sequencesPerSec': sequences / elapsed if elapsed else 0.0,
+        'stepsPerSec': steps / elapsed if elapsed else 0.0,
+        'failures': reproducers
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="model-based random API sequence fuzzer for libhash")
+    parser.add_argument("--lib", default=wrapper.defaultLibraryPath(), help="path to libhash.so")
+    parser.add_argument("-d", "--duration", type=float, default=DURATION, help="seconds to fuzz")
+    parser.add_argument("-n", "--sequences", type=int, help="stop after this many sequences")
+    parser.add_argument("-w", "--workers", type=int, help="forked workers, one per CPU by default")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS, help="calls per sequence at most")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = runFuzzer(args.lib, args.duration, args.workers, args.seed, args.sequences, args.max_steps)
+    print('{sequences} sequences, {steps} calls in {seconds:.1f} s - {sequencesPerSec:.0f} sequences/s, '
+          '{stepsPerSec:.0f} calls/s, {workers} workers'.format(**report))
+    for reproducer in report['failures']:
+        failure = reproducer['failure']
+        print('\nFAILED: {} (shrunk from {} to {} calls)'.format(
+            ', '.join('{}: {}'.format(key, value) for key, value in failure.items() if key != 'step'),
+            reproducer['original'], len(reproducer['sequence'])))
+        for call in reproducer['sequence']:
+            print('    {}'.format(call))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
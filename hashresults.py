@@ -0,0 +1,158 @@
+import sys
+from array import array
+
+CHUNK_SIZE = 4096
+DIGEST_SIZE = 16
+
+
+def parseLogLine(logLine):
+    """split a log line "<operation id> <path> <md5 hex>" into (opID, path, 16 byte digest), path may contain spaces
+
+    Raises ValueError for a malformed line, e.g. a digest which is not 32 hex digits - the vendor library prints
+    every byte with %X, so a lost zero can not be restored.
+    """
+    opID, rest = logLine.split(b' ', 1)
+    path, digest = rest.rsplit(b' ', 1)
+    if len(digest) != 2 * DIGEST_SIZE:
+        raise ValueError("malformed digest {!r} in log line {!r}".format(digest, logLine))
+    return int(opID), path, bytes.fromhex(digest.decode('ascii'))
+
+
+class HashResults(object):
+    """hashed-file log lines kept in parallel arrays - operation IDs (array('Q')), path IDs (array('I')) into an
+    interned path table and packed 16 byte digests (bytearray)
+
+    Storage is preallocated and grows by CHUNK_SIZE entries, a path seen before (e.g. the same tree hashed by
+    several operations) costs 4 bytes. Duplicate detection, lookups and comparison with expected digests are
+    linear in the number of entries. Log lines which can not be parsed are kept in malformed instead.
+    """
+
+    def __init__(self, capacity=CHUNK_SIZE):
+        self.count = 0
+        self.capacity = capacity
+        self.opIDs = array('Q', bytes(8 * capacity))
+        self.pathIDs = array('I', bytes(4 * capacity))
+        self.digests = bytearray(DIGEST_SIZE * capacity)
+        # interned path table - path by path ID, path ID by path, first entry and number of entries by path ID
+        self.pathTable = []
+        self.pathLookup = {}
+        self.pathFirst = array('I')
+        self.pathCounts = array('I')
+        self.malformed = []
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('HashResults index out of range')
+        return self.opIDs[index], self.pathTable[self.pathIDs[index]], self.digest(index)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def grow(self, chunk=CHUNK_SIZE):
+        self.opIDs.extend(array('Q', bytes(8 * chunk)))
+        self.pathIDs.extend(array('I', bytes(4 * chunk)))
+        self.digests.extend(bytes(DIGEST_SIZE * chunk))
+        self.capacity += chunk
+
+    def internPath(self, path, index):
+        pathID = self.pathLookup.get(path)
+        if pathID is None:
+            pathID = len(self.pathTable)
+            self.pathTable.append(path)
+            self.pathLookup[path] = pathID
+            self.pathFirst.append(index)
+            self.pathCounts.append(1)
+        else:
+            self.pathCounts[pathID] += 1
+        return pathID
+
+    def append(self, opID, path, digest):
+        index = self.count
+        if index == self.capacity:
+            self.grow()
+        self.opIDs[index] = opID
+        self.pathIDs[index] = self.internPath(path, index)
+        offset = index * DIGEST_SIZE
+        self.digests[offset:offset + DIGEST_SIZE] = digest
+        self.count = index + 1
+
+    def appendLogLine(self, logLine):
+        try:
+            opID, path, digest = parseLogLine(logLine)
+        except ValueError:
+            self.malformed.append(logLine)
+            return
+        self.append(opID, path, digest)
+
+    def digest(self, index):
+        offset = index * DIGEST_SIZE
+        return bytes(self.digests[offset:offset + DIGEST_SIZE])
+
+    def hexdigest(self, index):
+        offset = index * DIGEST_SIZE
+        return self.digests[offset:offset + DIGEST_SIZE].hex()
+
+    def paths(self):
+        """unique hashed paths in order of their first appearance"""
+        return list(self.pathTable)
+
+    def find(self, path):
+        """index of the first entry of path, None when the path was not hashed"""
+        pathID = self.pathLookup.get(path)
+        return None if pathID is None else self.pathFirst[pathID]
+
+    def lookup(self, path):
+        """digest of the first entry of path, None when the path was not hashed"""
+        index = self.find(path)
+        return None if index is None else self.digest(index)
+
+    def duplicatePaths(self):
+        """paths logged more than once"""
+        pathCounts = self.pathCounts
+        return [path for pathID, path in enumerate(self.pathTable) if pathCounts[pathID] > 1]
+
+    def opIDCounts(self):
+        """{operation ID: number of entries}"""
+        counts = {}
+        for opID in self.opIDs[:self.count]:
+            counts[opID] = counts.get(opID, 0) + 1
+        return counts
+
+    def duplicateOpIDs(self):
+        """operation IDs shared by more than one entry, in order of their first appearance"""
+        return [opID for opID, count in self.opIDCounts().items() if count > 1]
+
+    def compare(self, expected, normalize=None):
+        """compare with an expected {path: digest} map, return (missing, unexpected, mismatched) lists of paths
+
+        normalize maps a logged path to the key form of expected (e.g. relative to the hashed directory), it is
+        applied once per unique path. Every path is checked against the digest of its first entry.
+        """
+        missing = []
+        unexpected = []
+        mismatched = []
+        hashedKeys = set()
+        for pathID, path in enumerate(self.pathTable):
+            key = normalize(path) if normalize is not None else path
+            hashedKeys.add(key)
+            expectedDigest = expected.get(key)
+            if expectedDigest is None:
+                unexpected.append(key)
+            elif expectedDigest != self.digest(self.pathFirst[pathID]):
+                mismatched.append(key)
+        for key in expected:
+            if key not in hashedKeys:
+                missing.append(key)
+        return missing, unexpected, mismatched
+
+    def memoryUsage(self):
+        """approximate bytes held by this store"""
+        return (sys.getsizeof(self.opIDs) + sys.getsizeof(self.pathIDs) + sys.getsizeof(self.digests) +
+                sys.getsizeof(self.pathTable) + sys.getsizeof(self.pathLookup) + sys.getsizeof(self.pathFirst) +
+                sys.getsizeof(self.pathCounts) + sum(sys.getsizeof(path) for path in self.pathTable))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import argparse
+import ctypes
+import json
+import os
+import sys
+
+import waiter
+import wrapper
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CYCLES = 50
+INSTRUMENTED_FUNCTIONS = ('HashInit', 'HashTerminate', 'HashDirectory', 'HashReadNextLogLine', 'HashStatus',
+                          'HashStop', 'HashFree')
+
+
+def procSample():
+    """(resident set size in bytes, open file descriptors, threads) of this process, read from /proc/self"""
+    with open('/proc/self/statm') as statm:
+        rss = int(statm.read().split()[1]) * PAGE_SIZE
+    fds = len(os.listdir('/proc/self/fd'))
+    threads = 0
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('Threads:'):
+                threads = int(line.split()[1])
+                break
+    return rss, fds, threads
+
+
+def pointerValue(argument):
+    """address held by a char* or by the char* behind byref(char*)"""
+    target = getattr(argument, '_obj', argument)
+    return ctypes.cast(target, ctypes.c_void_p).value
+
+
+class LeakTracker(object):
+    """instruments a HashLibrary - /proc/self samples around every native call and log line allocation counts
+
+    The typed function attributes of the HashLibrary are replaced by sampling wrappers, so every method of the
+    session (and drainLog, statusPoller created afterwards) is covered.
+    """
+
+    def __init__(self):
+        self.calls = {name: 0 for name in INSTRUMENTED_FUNCTIONS}
+        self.deltas = {name: [0, 0, 0] for name in INSTRUMENTED_FUNCTIONS}
+        self.outstanding = set()
+        self.allocated = 0
+        self.freed = 0
+        self.unknownFrees = 0
+
+    def instrument(self, lib):
+        for name in INSTRUMENTED_FUNCTIONS:
+            setattr(lib, name, self.wrap(name, getattr(lib, name)))
+        return lib
+
+    def wrap(self, name, function):
+        calls = self.calls
+        delta = self.deltas[name]
+
+        def instrumented(*args):
+            before = procSample()
+            result = function(*args)
+            after = procSample()
+            calls[name] += 1
+            for index in range(3):
+                delta[index] += after[index] - before[index]
+            if name == 'HashReadNextLogLine' and result == 0:
+                self.allocated += 1
+                self.outstanding.add(pointerValue(args[0]))
+            elif name == 'HashFree':
+                address = pointerValue(args[0])
+                if address in self.outstanding:
+                    self.outstanding.remove(address)
+                    self.freed += 1
+                else:
+                    self.unknownFrees += 1
+            return result
+        return instrumented
+
+    def snapshot(self):
+        return {
+            'calls': dict(self.calls),
+            'deltas': {name: {'rss': delta[0], 'fds': delta[1], 'threads': delta[2]}
+                       for name, delta in self.deltas.items()},
+            'allocated': self.allocated,
+            'freed': self.freed,
+            'outstanding': len(self.outstanding),
+            'unknownFrees': self.unknownFrees
+        }
+
+
+def slope(values):
+    """least squares slope of values over their index"""
+    count = len(values)
+    if count < 2:
+        return 0.0
+    meanX = (count - 1) / 2.0
+    meanY = sum(values) / count
+    numerator = sum((index - meanX) * (value - meanY) for index, value in enumerate(values))
+    denominator = sum((index - meanX) ** 2 for index in range(count))
+    return numerator / denominator
+
+
+def runCycles(libFullPath, directory, cycles=CYCLES, operations=1):
+    """repeat init - hash - drain - stop - terminate, return per-cycle samples and growth slopes"""
+    tracker = LeakTracker()
+    lib = tracker.instrument(wrapper.HashLibrary(libFullPath))
+    curve = []
+    for cycle in range(cycles):
+        lib.init()
+        lines = 0
+        for _ in range(operations):
+            returnCode, opID = lib.directory(directory)
+            if returnCode != 0:
+                raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+            waiter.pollUntilDone(lib, opID)
+            returnCode, results = lib.drainLog()
+            lines += len(results)
+            lib.stop(opID)
+        lib.terminate()
+        rss, fds, threads = procSample()
+        curve.append({'cycle': cycle, 'rss': rss, 'fds': fds, 'threads': threads, 'lines': lines,
+                      'outstanding': len(tracker.outstanding)})
+
+    # the first cycles warm up allocators and caches, growth is fitted on the rest
+    steady = curve[len(curve) // 5:] if len(curve) >= 10 else curve
+    return {
+        'curve': curve,
+        'slopes': {key: slope([sample[key] for sample in steady]) for key in ('rss', 'fds', 'threads')},
+        'calls': tracker.snapshot()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="track native memory, descriptor and thread growth of libhash")
+    parser.add_argument("directory", nargs="?", default="./tested_dir")
+    parser.add_argument("--lib", default=wrapper.defaultLibraryPath(), help="path to libhash.so")
+    parser.add_argument("-n", "--cycles", type=int, default=CYCLES)
+    parser.add_argument("-p", "--operations", type=int, default=1, help="HashDirectory operations per cycle")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = runCycles(args.lib, args.directory, args.cycles, args.operations)
+    print('\n{:>6} {:>12} {:>6} {:>8} {:>10}'.format('cycle', 'rss KiB', 'fds', 'threads', 'unfreed'))
+    for sample in report['curve']:
+        print('{cycle:6} {rssKiB:12} {fds:6} {threads:8} {outstanding:10}'.format(
+            rssKiB=sample['rss'] // 1024, **sample))
+    slopes = report['slopes']
+    print('\ngrowth per cycle: rss {:.1f} B, fds {:.3f}, threads {:.3f}'.format(
+        slopes['rss'], slopes['fds'], slopes['threads']))
+    calls = report['calls']
+    print('log lines allocated {}, freed {}, outstanding {}, frees of unknown pointers {}'.format(
+        calls['allocated'], calls['freed'], calls['outstanding'], calls['unknownFrees']))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,19 @@
+import atexit
+import json
 import logging
+import queue
 import sys
-from logging.handlers import TimedRotatingFileHandler
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 
 FORMATTER = logging.Formatter("%(asctime)s — %(name)s — %(levelname)s — %(message)s")
 LOG_FILE = "log_tests.log"
+METRICS_FILE = "metrics_tests.jsonl"
+QUEUE_SIZE = 10000
+# what happens to a record when the queue is full
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_NEWEST = 'dropNewest'
+OVERFLOW_DROP_OLDEST = 'dropOldest'
 
 
 def getConsoleHandler():
@@ -12,17 +22,161 @@ def getConsoleHandler():
     return console_handler
 
 
-def getFileHandler():
-    file_handler = TimedRotatingFileHandler(LOG_FILE, when='midnight')
+def getFileHandler(logFile=LOG_FILE):
+    file_handler = TimedRotatingFileHandler(logFile, when='midnight')
     file_handler.setFormatter(FORMATTER)
     return file_handler
 
 
-def getLogger(logger_name):
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue, a full queue blocks the caller or drops the newest or the oldest record"""
+
+    def __init__(self, recordQueue, overflow=OVERFLOW_BLOCK):
+        super().__init__(recordQueue)
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST):
+            raise ValueError("unknown overflow policy: {}".format(overflow))
+        self.overflow = overflow
+        self.dropped = 0
+
+    def prepare(self, record):
+        # the queue stays in this process, so the record is formatted by the listener thread instead of here
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == OVERFLOW_BLOCK:
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+    def close(self):
+        """stop the listener once, records still in the queue are written before it ends"""
+        listener = getattr(self, 'listener', None)
+        if listener is not None:
+            listener.stop()
+            # cleared only after the listener ended, a failed stop can be repeated by the next close
+            self.listener = None
+            for handler in listener.handlers:
+                handler.close()
+        super().close()
+
+
+class BlockingQueueListener(QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full bounded queue instead of raising queue.Full"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def getQueueHandler(logFile=LOG_FILE, queueSize=QUEUE_SIZE, overflow=OVERFLOW_BLOCK):
+    """handler putting records to a bounded in-memory queue, a background thread writes them to logFile
+
+    Closing the handler, at the latest at interpreter exit, flushes the queue and stops the background thread.
+    """
+    recordQueue = queue.Queue(queueSize)
+    # created before the queue handler, logging.shutdown closes handlers in reverse order of creation
+    file_handler = getFileHandler(logFile)
+    queue_handler = BoundedQueueHandler(recordQueue, overflow)
+    queue_handler.listener = BlockingQueueListener(recordQueue, file_handler, respect_handler_level=True)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.close)
+    return queue_handler
+
+
+class LazyHandler(logging.Handler):
+    """handler creating the real handler (and its file, thread) from factory when the first record arrives"""
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.handler = None
+
+    def emit(self, record):
+        # called with the handler lock held, so the real handler is created once
+        if self.handler is None:
+            self.handler = self.factory()
+        self.handler.handle(record)
+
+    def flush(self):
+        if self.handler is not None:
+            self.handler.flush()
+
+    def close(self):
+        if self.handler is not None:
+            self.handler.close()
+        super().close()
+
+
+class MetricsLog(object):
+    """append-only JSON lines sink, one object per event
+
+    Events skip the logging machinery - no LogRecord, no formatter, fields with None are left out and the
+    object is serialized by one compact encoder into a buffered file, opened with the first event.
+    """
+
+    def __init__(self, metricsFile=METRICS_FILE, returnCodes=None):
+        self.metricsFile = metricsFile
+        self.returnCodes = returnCodes or {}
+        self.output = None
+        self.encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False).encode
+        atexit.register(self.close)
+
+    def event(self, test=None, call=None, returnCode=None, durationNs=None, files=None, byteCount=None, opID=None,
+              **fields):
+        record = {'ts': time.time_ns()}
+        if test is not None:
+            record['test'] = test
+        if call is not None:
+            record['call'] = call
+        if returnCode is not None:
+            record['returnCode'] = self.returnCodes.get(returnCode, returnCode)
+        if durationNs is not None:
+            record['durationNs'] = durationNs
+        if files is not None:
+            record['files'] = files
+        if byteCount is not None:
+            record['bytes'] = byteCount
+        if opID is not None:
+            record['opID'] = opID
+        if fields:
+            record.update(fields)
+        if self.output is None:
+            self.output = open(self.metricsFile, 'a', encoding='utf-8')
+        self.output.write(self.encode(record) + '\n')
+
+    def flush(self):
+        if self.output is not None:
+            self.output.flush()
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+
+def getMetricsLog(metricsFile=METRICS_FILE, returnCodes=None):
+    return MetricsLog(metricsFile, returnCodes)
+
+
+def getLogger(logger_name, queued=True, lazy=True):
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.DEBUG)
     # logger.addHandler(get_console_handler())
-    logger.addHandler(getFileHandler())
+    # file I/O happens on the listener thread, so polling and log draining do not wait for the disk
+    factory = getQueueHandler if queued else getFileHandler
+    # with lazy, the log file is opened (and the listener started) by the first record, not at import
+    logger.addHandler(LazyHandler(factory) if lazy else factory())
     # with this pattern, it's necessary to propagate the error up to parent
     logger.propagate = False
     return logger
@@ -0,0 +1,71 @@
+import functools
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 64 << 20
+
+
+def defaultWorkers():
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def md5File(path, chunkSize=CHUNK_SIZE, mmapThreshold=MMAP_THRESHOLD):
+    """return MD5 digest (16 bytes) of a file, files larger than chunkSize are read in chunks into one reused
+    buffer, files of mmapThreshold bytes and more are hashed through mmap
+
+    hashlib releases the GIL while hashing large buffers, so several calls can run in parallel threads.
+    """
+    md5 = hashlib.md5()
+    with open(path, "rb") as inputFile:
+        size = os.fstat(inputFile.fileno()).st_size
+        if mmapThreshold is not None and size and size >= mmapThreshold:
+            with mmap.mmap(inputFile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+                md5.update(mapped)
+        elif size <= chunkSize:
+            md5.update(inputFile.read())
+        else:
+            buffer = bytearray(chunkSize)
+            view = memoryview(buffer)
+            readinto = inputFile.readinto
+            while True:
+                got = readinto(buffer)
+                if not got:
+                    break
+                md5.update(view[:got])
+    return md5.digest()
+
+
+def listFiles(directory, recursive=False):
+    """yield paths of regular files in directory, symbolic links are not followed"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry.path
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                yield from listFiles(entry.path, recursive)
+
+
+def md5Files(paths, workers=None, chunkSize=CHUNK_SIZE, mmapThreshold=MMAP_THRESHOLD):
+    """compute MD5 digests of paths on a bounded thread pool, return {path: digest}"""
+    if workers is None:
+        workers = defaultWorkers()
+    digests = {}
+    if workers <= 1:
+        for path in paths:
+            digests[path] = md5File(path, chunkSize, mmapThreshold)
+        return digests
+    hashFile = functools.partial(md5File, chunkSize=chunkSize, mmapThreshold=mmapThreshold)
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="md5") as executor:
+        for path, digest in zip(paths, executor.map(hashFile, paths)):
+            digests[path] = digest
+    return digests
+
+
+def md5Directory(directory, recursive=False, workers=None, chunkSize=CHUNK_SIZE, mmapThreshold=MMAP_THRESHOLD):
+    """reference MD5 digests of all regular files in directory, return {path: digest}"""
+    return md5Files(listFiles(directory, recursive), workers, chunkSize, mmapThreshold)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from logging.handlers import QueueHandler
+from multiprocessing.connection import wait
+
+import digestcache
+
+TEST_TIMEOUT = 60.0
+
+
+class ConnectionHandler(QueueHandler):
+    """QueueHandler sending prepared records over the result connection of the test instead of a queue"""
+
+    def enqueue(self, record):
+        self.queue.send(('log', record))
+
+
+def runTest(testName, libFullPath, directory, resultConnection):
+    """worker entry point - run one test from tests.py in a fresh process and send its result to the parent"""
+    import tests
+
+    # log records go to the parent, which owns the log file, over the test's own pipe - a worker killed while
+    # sending can not corrupt the records of the others
+    tests.log.handlers = [ConnectionHandler(resultConnection)]
+    tests.inputLib = libFullPath
+    tests.inputDirectory = directory
+    start = time.perf_counter()
+    try:
+        result = bool(getattr(tests, testName)())
+    except Exception as e:
+        tests.log.exception("{} - {}".format(testName, e))
+        result = False
+    resultConnection.send(('result', (result, time.perf_counter() - start)))
+    resultConnection.close()
+
+
+def runIsolated(testNames, libFullPath, directory, workers=None, timeout=TEST_TIMEOUT, log=None):
+    """run every test in its own spawned process, at most workers processes at once
+
+    A test which does not finish within timeout seconds is killed, a test whose process dies (e.g. segfault in
+    libhash.so) is failed, the other tests are not affected. Log records of the workers are read continuously
+    while they run. Returns {testName: (passed, wallTime)}.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if log is None:
+        log = logging.getLogger("test")
+    # the workers share the digest cache generation of this run instead of each starting its own
+    digestcache.startRun()
+    context = multiprocessing.get_context("spawn")
+    pending = deque(testNames)
+    running = {}
+    results = {}
+
+    while pending or running:
+        while pending and len(running) < workers:
+            testName = pending.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=runTest, name=testName, daemon=True,
+                                      args=(testName, libFullPath, directory, sender))
+            process.start()
+            # the parent's copy of the sending end is closed, so the receiver reports EOF once the worker exits
+            sender.close()
+            running[receiver] = (testName, process, time.perf_counter())
+
+        now = time.perf_counter()
+        nextDeadline = min(start + timeout for _, _, start in running.values())
+        ready = wait(list(running), timeout=max(0.0, nextDeadline - now))
+
+        now = time.perf_counter()
+        for receiver in ready:
+            testName, process, start = running[receiver]
+            try:
+                while receiver.poll():
+                    kind, payload = receiver.recv()
+                    if kind == 'log':
+                        log.handle(payload)
+                    else:
+                        results[testName] = payload
+                continue
+            except EOFError:
+                pass
+            process.join()
+            if testName not in results:
+                log.error("{} - test process died, exit code: {}".format(testName, process.exitcode))
+                results[testName] = (False, now - start)
+            receiver.close()
+            del running[receiver]
+
+        for receiver, (testName, process, start) in list(running.items()):
+            if now - start < timeout:
+                continue
+            process.kill()
+            process.join()
+            if testName not in results:
+                log.error("{} - killed after timeout of {} s".format(testName, timeout))
+                results[testName] = (False, now - start)
+            receiver.close()
+            del running[receiver]
+
+    return results
+
+
+def main(argv=None):
+    import tests
+
+    parser = argparse.ArgumentParser(description="run tests from tests.py in isolated parallel processes")
+    parser.add_argument("tests", nargs="*", help="names of tests to run, all tests_to_run by default")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of parallel processes")
+    parser.add_argument("-t", "--timeout", type=float, default=TEST_TIMEOUT, help="timeout per test in seconds")
+    parser.add_argument("--lib", default=tests.inputLib, help="path to libhash.so")
+    parser.add_argument("--directory", default=tests.inputDirectory, help="tested directory")
+    args = parser.parse_args(argv)
+
+    testNames = args.tests or [test.__name__ for test in tests.tests_to_run]
+    start = time.perf_counter()
+    results = runIsolated(testNames, args.lib, args.directory, args.workers, args.timeout, tests.log)
+    elapsed = time.perf_counter() - start
+
+    counter = 0
+    print('\nWall time per test:')
+    for testName in testNames:
+        passed, wallTime = results[testName]
+        counter += not passed
+        tests.metrics.event(test=testName, durationNs=int(wallTime * 1e9), passed=passed)
+        print('{:45} {:10.3f} ms {}'.format(testName, wallTime * 1000, 'passed' if passed else 'FAILED'))
+    print('{:45} {:10.3f} ms'.format('suite', elapsed * 1000))
+    tests.log.info("{} tests failed".format(counter))
+    return counter
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+/**
+ * @brief Reference implementation of the hash.h ABI
+ *
+ * Stand-in for the vendor libhash.so used for offline runs and as a performance baseline. Every HashDirectory
+ * operation gets its own coordinator thread which walks the directory and hands files to a shared worker pool,
+ * finished lines go to a mutex protected log queue read by HashReadNextLogLine.
+ */
+#include "hash.h"
+#include "md5.h"
+
+#include <atomic>
+#include <condition_variable>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <deque>
+#include <exception>
+#include <filesystem>
+#include <functional>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <thread>
+#include <vector>
+
+namespace
+{
+    const size_t READ_CHUNK_SIZE = 1 << 16;
+
+    class ThreadPool
+    {
+    public:
+        explicit ThreadPool(size_t count)
+        {
+            for (size_t i = 0; i < count; ++i)
+                workers.emplace_back([this] { run(); });
+        }
+
+        ~ThreadPool()
+        {
+            {
+                std::lock_guard<std::mutex> lock(mutex);
+                stopping = true;
+            }
+            available.notify_all();
+            for (auto& worker : workers)
+                worker.join();
+        }
+
+        void submit(std::function<void()> task)
+        {
+            {
+                std::lock_guard<std::mutex> lock(mutex);
+                tasks.push_back(std::move(task));
+            }
+            available.notify_one();
+        }
+
+    private:
+        void run()
+        {
+            for (;;)
+            {
+                std::function<void()> task;
+                {
+                    std::unique_lock<std::mutex> lock(mutex);
+                    available.wait(lock, [this] { return stopping || !tasks.empty(); });
+                    if (tasks.empty())
+                        return;
+                    task = std::move(tasks.front());
+                    tasks.pop_front();
+                }
+                task();
+            }
+        }
+
+        std::vector<std::thread> workers;
+        std::deque<std::function<void()>> tasks;
+        std::mutex mutex;
+        std::condition_variable available;
+        bool stopping = false;
+    };
+
+    struct Operation
+    {
+        size_t id = 0;
+        std::atomic<bool> stopRequested{false};
+        std::atomic<bool> running{true};
+        std::mutex mutex;
+        std::condition_variable idle;
+        size_t pending = 0;
+        std::thread coordinator;
+    };
+
+    struct State
+    {
+        std::mutex stateMutex;
+        bool initialized = false;
+        size_t nextId = 1;
+        std::unique_ptr<ThreadPool> pool;
+        std::map<size_t, std::shared_ptr<Operation>> operations;
+        // HashStop calls joining an operation outside stateMutex, HashTerminate waits for them before it
+        // destroys the pool their coordinators still submit to
+        size_t stopsInProgress = 0;
+        std::condition_variable stopsDone;
+
+        std::mutex logMutex;
+        std::deque<std::string> log;
+    };
+
+    // never destroyed, operations left running by a process exiting without HashTerminate must not see
+    // their pool and log torn down under them
+    State& g = *new State;
+
+    void appendLog(std::string line)
+    {
+        std::lock_guard<std::mutex> lock(g.logMutex);
+        g.log.push_back(std::move(line));
+    }
+
+    bool hashFile(const std::string& path, const std::atomic<bool>& stopRequested, uint8_t digest[16])
+    {
+        FILE* file = fopen(path.c_str(), "rb");
+        if (!file)
+            return false;
+        std::vector<uint8_t> buffer(READ_CHUNK_SIZE);
+        Md5 md5;
+        size_t got;
+        while ((got = fread(buffer.data(), 1, buffer.size(), file)) > 0)
+        {
+            if (stopRequested.load(std::memory_order_relaxed))
+            {
+                fclose(file);
+                return false;
+            }
+            md5.update(buffer.data(), got);
+        }
+        bool ok = !ferror(file);
+        fclose(file);
+        if (ok)
+            md5.finish(digest);
+        return ok;
+    }
+
+    void hashOne(const std::shared_ptr<Operation>& operation, const std::string& path)
+    {
+        uint8_t digest[16];
+        if (!operation->stopRequested && hashFile(path, operation->stopRequested, digest))
+        {
+            static const char HEX[] = "0123456789ABCDEF";
+            std::string line = std::to_string(operation->id) + " " + path + " ";
+            for (uint8_t byte : digest)
+            {
+                line += HEX[byte >> 4];
+                line += HEX[byte & 0x0f];
+            }
+            appendLog(std::move(line));
+        }
+        std::lock_guard<std::mutex> lock(operation->mutex);
+        if (--operation->pending == 0)
+            operation->idle.notify_all();
+    }
+
+    void coordinate(std::shared_ptr<Operation> operation, std::string directory, ThreadPool* pool)
+    {
+        std::error_code error;
+        auto options = std::filesystem::directory_options::skip_permission_denied;
+        for (std::filesystem::recursive_directory_iterator it(directory, options, error), end;
+             !error && it != end && !operation->stopRequested; it.increment(error))
+        {
+            std::error_code typeError;
+            if (!it->is_regular_file(typeError))
+                continue;
+            {
+                std::lock_guard<std::mutex> lock(operation->mutex);
+                ++operation->pending;
+            }
+            std::string path = it->path().string();
+            pool->submit([operation, path] { hashOne(operation, path); });
+        }
+        std::unique_lock<std::mutex> lock(operation->mutex);
+        operation->idle.wait(lock, [&operation] { return operation->pending == 0; });
+        operation->running = false;
+    }
+
+    // counts a HashStop from taking its operation out of the table until the join returned, also when it throws
+    struct StopInProgress
+    {
+        ~StopInProgress()
+        {
+            std::lock_guard<std::mutex> lock(g.stateMutex);
+            if (--g.stopsInProgress == 0)
+                g.stopsDone.notify_all();
+        }
+    };
+
+    void joinOperation(const std::shared_ptr<Operation>& operation)
+    {
+        operation->stopRequested = true;
+        if (operation->coordinator.joinable())
+            operation->coordinator.join();
+    }
+}
+
+extern "C"
+{
+    EXPORT
+    uint32_t HashInit()
+    {
+        try
+        {
+            std::lock_guard<std::mutex> lock(g.stateMutex);
+            if (g.initialized)
+                return HASH_ERROR_ALREADY_INITIALIZED;
+            size_t workers = std::thread::hardware_concurrency();
+            g.pool.reset(new ThreadPool(workers ? workers : 1));
+            g.nextId = 1;
+            g.initialized = true;
+            return HASH_ERROR_OK;
+        }
+        catch (const std::bad_alloc&)
+        {
+            return HASH_ERROR_MEMORY;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    uint32_t HashTerminate()
+    {
+        try
+        {
+            std::map<size_t, std::shared_ptr<Operation>> operations;
+            std::unique_ptr<ThreadPool> pool;
+            {
+                std::unique_lock<std::mutex> lock(g.stateMutex);
+                if (!g.initialized)
+                    return HASH_ERROR_NOT_INITIALIZED;
+                g.initialized = false;
+                operations.swap(g.operations);
+                pool.swap(g.pool);
+                g.stopsDone.wait(lock, [] { return g.stopsInProgress == 0; });
+            }
+            for (auto& entry : operations)
+                joinOperation(entry.second);
+            pool.reset();
+            std::lock_guard<std::mutex> lock(g.logMutex);
+            g.log.clear();
+            return HASH_ERROR_OK;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    uint32_t HashDirectory(const char* directory, size_t* id)
+    {
+        try
+        {
+            if (!directory || !id)
+                return HASH_ERROR_ARGUMENT_NULL;
+            std::lock_guard<std::mutex> lock(g.stateMutex);
+            if (!g.initialized)
+                return HASH_ERROR_NOT_INITIALIZED;
+            std::error_code error;
+            if (!std::filesystem::is_directory(directory, error))
+                return HASH_ERROR_ARGUMENT_INVALID;
+            auto operation = std::make_shared<Operation>();
+            operation->id = g.nextId++;
+            operation->coordinator = std::thread(coordinate, operation, std::string(directory), g.pool.get());
+            g.operations[operation->id] = operation;
+            *id = operation->id;
+            return HASH_ERROR_OK;
+        }
+        catch (const std::bad_alloc&)
+        {
+            return HASH_ERROR_MEMORY;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    uint32_t HashReadNextLogLine(char** hash)
+    {
+        try
+        {
+            if (!hash)
+                return HASH_ERROR_ARGUMENT_NULL;
+            {
+                std::lock_guard<std::mutex> lock(g.stateMutex);
+                if (!g.initialized)
+                    return HASH_ERROR_NOT_INITIALIZED;
+            }
+            std::string line;
+            {
+                std::lock_guard<std::mutex> lock(g.logMutex);
+                if (g.log.empty())
+                    return HASH_ERROR_LOG_EMPTY;
+                line.swap(g.log.front());
+                g.log.pop_front();
+            }
+            char* copy = static_cast<char*>(malloc(line.size() + 1));
+            if (!copy)
+                return HASH_ERROR_MEMORY;
+            memcpy(copy, line.c_str(), line.size() + 1);
+            *hash = copy;
+            return HASH_ERROR_OK;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    uint32_t HashStatus(size_t id, bool* running)
+    {
+        try
+        {
+            if (!running)
+                return HASH_ERROR_ARGUMENT_NULL;
+            std::lock_guard<std::mutex> lock(g.stateMutex);
+            if (!g.initialized)
+                return HASH_ERROR_NOT_INITIALIZED;
+            auto found = g.operations.find(id);
+            if (found == g.operations.end())
+                return HASH_ERROR_ARGUMENT_INVALID;
+            *running = found->second->running;
+            return HASH_ERROR_OK;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    uint32_t HashStop(size_t id)
+    {
+        try
+        {
+            std::shared_ptr<Operation> operation;
+            {
+                std::lock_guard<std::mutex> lock(g.stateMutex);
+                // as the vendor library (and test13) - after HashTerminate no operation ID is valid any more
+                if (!g.initialized)
+                    return HASH_ERROR_ARGUMENT_INVALID;
+                auto found = g.operations.find(id);
+                if (found == g.operations.end())
+                    return HASH_ERROR_ARGUMENT_INVALID;
+                // the operation is owned by this call from here, a concurrent HashTerminate does not see it
+                operation = found->second;
+                g.operations.erase(found);
+                ++g.stopsInProgress;
+            }
+            StopInProgress stopping;
+            joinOperation(operation);
+            return HASH_ERROR_OK;
+        }
+        catch (const std::exception&)
+        {
+            return HASH_ERROR_EXCEPTION;
+        }
+    }
+
+    EXPORT
+    void HashFree(void* hash)
+    {
+        free(hash);
+    }
+}
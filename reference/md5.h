@@ -0,0 +1,117 @@
+#pragma once
+
+#include <stdint.h>
+#include <stddef.h>
+#include <string.h>
+
+/**
+ * @brief Minimal RFC 1321 MD5, kept in a header so the reference library has no external dependencies
+ */
+class Md5
+{
+public:
+    Md5() { reset(); }
+
+    void reset()
+    {
+        state[0] = 0x67452301;
+        state[1] = 0xefcdab89;
+        state[2] = 0x98badcfe;
+        state[3] = 0x10325476;
+        length = 0;
+        bufferUsed = 0;
+    }
+
+    void update(const uint8_t* data, size_t size)
+    {
+        length += size;
+        if (bufferUsed)
+        {
+            size_t take = 64 - bufferUsed < size ? 64 - bufferUsed : size;
+            memcpy(buffer + bufferUsed, data, take);
+            bufferUsed += take;
+            data += take;
+            size -= take;
+            if (bufferUsed < 64)
+                return;
+            transform(buffer);
+            bufferUsed = 0;
+        }
+        while (size >= 64)
+        {
+            transform(data);
+            data += 64;
+            size -= 64;
+        }
+        memcpy(buffer, data, size);
+        bufferUsed = size;
+    }
+
+    void finish(uint8_t digest[16])
+    {
+        uint64_t bits = length * 8;
+        uint8_t pad = 0x80;
+        update(&pad, 1);
+        pad = 0;
+        while (bufferUsed != 56)
+            update(&pad, 1);
+        uint8_t tail[8];
+        for (int i = 0; i < 8; ++i)
+            tail[i] = (uint8_t)(bits >> (8 * i));
+        update(tail, 8);
+        for (int i = 0; i < 4; ++i)
+            for (int j = 0; j < 4; ++j)
+                digest[i * 4 + j] = (uint8_t)(state[i] >> (8 * j));
+    }
+
+private:
+    static uint32_t rotl(uint32_t x, int c) { return (x << c) | (x >> (32 - c)); }
+
+    void transform(const uint8_t block[64])
+    {
+        static const uint32_t K[64] = {
+            0xd76aa478, 0xe8c7b756, 0x242070db, 0xc1bdceee, 0xf57c0faf, 0x4787c62a, 0xa8304613, 0xfd469501,
+            0x698098d8, 0x8b44f7af, 0xffff5bb1, 0x895cd7be, 0x6b901122, 0xfd987193, 0xa679438e, 0x49b40821,
+            0xf61e2562, 0xc040b340, 0x265e5a51, 0xe9b6c7aa, 0xd62f105d, 0x02441453, 0xd8a1e681, 0xe7d3fbc8,
+            0x21e1cde6, 0xc33707d6, 0xf4d50d87, 0x455a14ed, 0xa9e3e905, 0xfcefa3f8, 0x676f02d9, 0x8d2a4c8a,
+            0xfffa3942, 0x8771f681, 0x6d9d6122, 0xfde5380c, 0xa4beea44, 0x4bdecfa9, 0xf6bb4b60, 0xbebfbc70,
+            0x289b7ec6, 0xeaa127fa, 0xd4ef3085, 0x04881d05, 0xd9d4d039, 0xe6db99e5, 0x1fa27cf8, 0xc4ac5665,
+            0xf4292244, 0x432aff97, 0xab9423a7, 0xfc93a039, 0x655b59c3, 0x8f0ccc92, 0xffeff47d, 0x85845dd1,
+            0x6fa87e4f, 0xfe2ce6e0, 0xa3014314, 0x4e0811a1, 0xf7537e82, 0xbd3af235, 0x2ad7d2bb, 0xeb86d391};
+        static const int R[64] = {
+            7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22,
+            5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20,
+            4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23,
+            6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21};
+
+        uint32_t m[16];
+        for (int i = 0; i < 16; ++i)
+            m[i] = (uint32_t)block[i * 4] | ((uint32_t)block[i * 4 + 1] << 8) |
+                   ((uint32_t)block[i * 4 + 2] << 16) | ((uint32_t)block[i * 4 + 3] << 24);
+
+        uint32_t a = state[0], b = state[1], c = state[2], d = state[3];
+        for (int i = 0; i < 64; ++i)
+        {
+            uint32_t f;
+            int g;
+            if (i < 16) { f = (b & c) | (~b & d); g = i; }
+            else if (i < 32) { f = (d & b) | (~d & c); g = (5 * i + 1) % 16; }
+            else if (i < 48) { f = b ^ c ^ d; g = (3 * i + 5) % 16; }
+            else { f = c ^ (b | ~d); g = (7 * i) % 16; }
+            uint32_t tmp = d;
+            d = c;
+            c = b;
+            b = b + rotl(a + f + K[i] + m[g], R[i]);
+            a = tmp;
+        }
+        state[0] += a;
+        state[1] += b;
+        state[2] += c;
+        state[3] += d;
+    }
+
+    uint32_t state[4];
+    uint64_t length;
+    uint8_t buffer[64];
+    size_t bufferUsed;
+};
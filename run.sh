@@ -1 +1,3 @@
+# HASH_LIBRARY selects the library under test, e.g. HASH_LIBRARY=./reference/libhash.so after make -C reference
+# single tests with repeats: python3 -m runner test4 -r 50 -w 5 (python3 -m runner --help)
 export LD_LIBRARY_PATH=.;python3 tests.py
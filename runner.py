@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""run selected tests of tests.py repeatedly - python -m runner [pattern ...] [-r repeat] [-w warmup]"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import sys
+import time
+
+import tests
+from calltiming import percentiles
+
+REPEAT = 1
+WARMUP = 0
+
+
+def shortName(test):
+    """test4 for test4_checkHashesOfHashedFiles"""
+    return test.__name__.split('_')[0]
+
+
+def selectTests(patterns, available=None):
+    """tests whose name or short name (test4) matches any of the glob patterns, in suite order"""
+    available = tests.tests_to_run if available is None else available
+    if not patterns:
+        return list(available)
+    selected = [test for test in available
+                if any(fnmatch.fnmatchcase(test.__name__, pattern) or fnmatch.fnmatchcase(shortName(test), pattern)
+                       for pattern in patterns)]
+    unmatched = [pattern for pattern in patterns
+                 if not any(fnmatch.fnmatchcase(test.__name__, pattern) or fnmatch.fnmatchcase(shortName(test), pattern)
+                            for test in available)]
+    if unmatched:
+        raise ValueError("no test matches {}, tests: {}".format(
+            ', '.join(unmatched), ', '.join(shortName(test) for test in available)))
+    return selected
+
+
+def runTest(test, sharedFixtures=False, verbose=False):
+    """one run of test - returns (passed, wall seconds), the output of the test is dropped unless verbose"""
+    if not sharedFixtures:
+        tests.hashedDirectories.clear()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        start = time.perf_counter()
+        try:
+            passed = bool(tests.runTestCase(test))
+        except Exception as e:
+            tests.log.exception(e)
+            passed = False
+        elapsed = time.perf_counter() - start
+    return passed, elapsed
+
+
+def runTests(selected, repeat=REPEAT, warmup=WARMUP, sharedFixtures=False, verbose=False):
+    """warmup unmeasured and repeat measured runs of every selected test, return {test name: summary}"""
+    report = {}
+    for test in selected:
+        for _ in range(warmup):
+            runTest(test, sharedFixtures, verbose)
+        wallTimes = []
+        failed = 0
+        for _ in range(repeat):
+            passed, elapsed = runTest(test, sharedFixtures, verbose)
+            wallTimes.append(elapsed * 1000)
+            failed += not passed
+        summary = percentiles(wallTimes)
+        report[test.__name__] = {'runs': repeat, 'failed': failed, 'minMs': summary['min'],
+                                 'medianMs': summary['p50'], 'p99Ms': summary['p99']}
+        tests.metrics.event(test=test.__name__, durationNs=int(summary['p50'] * 1e6), runs=repeat, failed=failed,
+                            minNs=int(summary['min'] * 1e6), p99Ns=int(summary['p99'] * 1e6))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m runner", description="run selected tests with repeats")
+    parser.add_argument("patterns", nargs="*", help="test names or globs, e.g. test4, 'test1?', '*Stop*'; all by "
+                                                    "default")
+    parser.add_argument("-r", "--repeat", type=int, default=REPEAT, help="measured runs per test")
+    parser.add_argument("-w", "--warmup", type=int, default=WARMUP, help="unmeasured runs before the measured ones")
+    parser.add_argument("--lib", help="path to libhash.so, {} by default".format(tests.inputLib))
+    parser.add_argument("--corpus", help="run on the corpus tree of this profile instead of tested_dir")
+    parser.add_argument("--shared-fixtures", action="store_true",
+                        help="reuse the hashed directory between runs instead of hashing it in every run")
+    parser.add_argument("-l", "--list", action="store_true", help="list the tests and exit")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the output of the tests")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for test in tests.tests_to_run:
+            print('{:8} {}'.format(shortName(test), test.__name__))
+        return 0
+    try:
+        selected = selectTests(args.patterns)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.lib:
+        tests.inputLib = args.lib
+    if args.corpus:
+        tests.useCorpus(args.corpus)
+    tests.prepareCorpus()
+
+    report = runTests(selected, args.repeat, args.warmup, args.shared_fixtures, args.verbose)
+    print('\n{:45} {:>6} {:>7} {:>10} {:>10} {:>10}'.format('test', 'runs', 'failed', 'min ms', 'median ms',
+                                                             'p99 ms'))
+    for testName, summary in report.items():
+        print('{:45} {runs:6} {failed:7} {minMs:10.3f} {medianMs:10.3f} {p99Ms:10.3f}'.format(testName, **summary))
+    tests.dumpCallTiming()
+    failed = sum(summary['failed'] for summary in report.values())
+    if failed:
+        tests.log.info("{} test runs failed".format(failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import struct
+import sys
+
+import hashresults
+import waiter
+import walker
+import wrapper
+
+MAGIC = b'HASHSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sHQ')
+# length of the prefix shared with the previous path, length of the rest
+RECORD = struct.Struct('<HH')
+DIGEST_SIZE = hashresults.DIGEST_SIZE
+BUFFER_SIZE = 1 << 20
+
+ADDED = 'added'
+MISSING = 'missing'
+CHANGED = 'changed'
+
+
+def commonPrefix(first, second):
+    length = min(len(first), len(second), 0xffff)
+    index = 0
+    while index < length and first[index] == second[index]:
+        index += 1
+    return index
+
+
+def writeSnapshot(entries, snapshotFile):
+    """write (path, digest) entries, sorted by path (bytes) and unique, to snapshotFile, return their count
+
+    Records are front coded - every path stores only the part not shared with the previous one - and are
+    followed by the raw 16 byte digest. The file is written next to snapshotFile and renamed when complete.
+    """
+    temporary = snapshotFile + '.tmp'
+    count = 0
+    previous = b''
+    with open(temporary, 'wb', buffering=BUFFER_SIZE) as output:
+        output.write(HEADER.pack(MAGIC, VERSION, 0))
+        pack = RECORD.pack
+        write = output.write
+        for path, digest in entries:
+            if count and path <= previous:
+                raise ValueError("snapshot entries are not sorted and unique: {!r} after {!r}".format(path, previous))
+            shared = commonPrefix(previous, path)
+            suffix = path[shared:]
+            if len(suffix) > 0xffff:
+                raise ValueError("path too long for a snapshot: {!r}".format(path))
+            write(pack(shared, len(suffix)))
+            write(suffix)
+            write(digest)
+            previous = path
+            count += 1
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, count))
+    os.replace(temporary, snapshotFile)
+    return count
+
+
+def saveResults(results, snapshotFile, root=None):
+    """write the unique paths of a HashResults with the digest of their first entry, paths relative to root"""
+    entries = {}
+    for path in results.paths():
+        entries[walker.normalizePath(path, root) if root is not None else path] = results.lookup(path)
+    return writeSnapshot(sorted(entries.items()), snapshotFile)
+
+
+def snapshotCount(snapshotFile):
+    with open(snapshotFile, 'rb') as snapshot:
+        return readHeader(snapshot)
+
+
+def readHeader(snapshot):
+    header = snapshot.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError("{} is not a hash snapshot".format(snapshot.name))
+    magic, version, count = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("{} is not a hash snapshot".format(snapshot.name))
+    if version != VERSION:
+        raise ValueError("{} has unsupported snapshot version {}".format(snapshot.name, version))
+    return count
+
+
+def iterSnapshot(snapshotFile):
+    """stream (path, digest) of a snapshot in path order, only the current record is held in memory"""
+    with open(snapshotFile, 'rb', buffering=BUFFER_SIZE) as snapshot:
+        count = readHeader(snapshot)
+        read = snapshot.read
+        unpack = RECORD.unpack
+        path = b''
+        for _ in range(count):
+            record = read(RECORD.size)
+            if len(record) != RECORD.size:
+                raise ValueError("{} is truncated".format(snapshotFile))
+            shared, suffixLength = unpack(record)
+            data = read(suffixLength + DIGEST_SIZE)
+            if len(data) != suffixLength + DIGEST_SIZE:
+                raise ValueError("{} is truncated".format(snapshotFile))
+            path = path[:shared] + data[:suffixLength]
+            yield path, data[suffixLength:]
+
+
+def diffSnapshots(oldFile, newFile):
+    """merge join of two snapshots in one streaming pass, yield (kind, path, oldDigest, newDigest)
+
+    kind is ADDED (only in the new snapshot), MISSING (only in the old one) or CHANGED (different digests).
+    """
+    old = iterSnapshot(oldFile)
+    new = iterSnapshot(newFile)
+    oldEntry = next(old, None)
+    newEntry = next(new, None)
+    while oldEntry is not None or newEntry is not None:
+        if newEntry is None or (oldEntry is not None and oldEntry[0] < newEntry[0]):
+            yield MISSING, oldEntry[0], oldEntry[1], None
+            oldEntry = next(old, None)
+        elif oldEntry is None or newEntry[0] < oldEntry[0]:
+            yield ADDED, newEntry[0], None, newEntry[1]
+            newEntry = next(new, None)
+        else:
+            if oldEntry[1] != newEntry[1]:
+                yield CHANGED, oldEntry[0], oldEntry[1], newEntry[1]
+            oldEntry = next(old, None)
+            newEntry = next(new, None)
+
+
+def hashToSnapshot(libFullPath, directory, snapshotFile):
+    """hash directory with the library and save the drained log as a snapshot, return the entry count"""
+    with wrapper.HashLibrary(libFullPath) as lib:
+        returnCode, opID = lib.directory(directory)
+        if returnCode != 0:
+            raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+        results = hashresults.HashResults()
+        returnCode, stats = waiter.pollUntilDone(lib, opID)
+        lib.drainLog(results=results)
+        lib.stop(opID)
+    duplicates = len(results) - len(results.paths())
+    if duplicates:
+        print('{} duplicate log lines, the first digest of every path is saved'.format(duplicates))
+    if results.malformed:
+        print('{} malformed log lines are not saved, e.g. {!r}'.format(len(results.malformed), results.malformed[0]))
+    return saveResults(results, snapshotFile, directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="golden hash log snapshots and their diff")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    save = subparsers.add_parser("save", help="hash a directory and save the log as a snapshot")
+    save.add_argument("directory")
+    save.add_argument("snapshot")
+    save.add_argument("--lib", default=wrapper.defaultLibraryPath(), help="path to libhash.so")
+
+    diff = subparsers.add_parser("diff", help="report added, missing and changed entries of two snapshots")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("-n", "--limit", type=int, default=20, help="entries printed per kind, -1 all")
+
+    show = subparsers.add_parser("show", help="print the entries of a snapshot")
+    show.add_argument("snapshot")
+
+    args = parser.parse_args(argv)
+    if args.command == "save":
+        count = hashToSnapshot(args.lib, args.directory, args.snapshot)
+        print('{} entries saved to {}'.format(count, args.snapshot))
+    elif args.command == "show":
+        for path, digest in iterSnapshot(args.snapshot):
+            print('{} {}'.format(os.fsdecode(path), digest.hex()))
+    elif args.command == "diff":
+        counts = {ADDED: 0, MISSING: 0, CHANGED: 0}
+        for kind, path, oldDigest, newDigest in diffSnapshots(args.old, args.new):
+            counts[kind] += 1
+            if args.limit < 0 or counts[kind] <= args.limit:
+                print('{:8} {} {} -> {}'.format(kind, os.fsdecode(path), oldDigest.hex() if oldDigest else '-',
+                                                newDigest.hex() if newDigest else '-'))
+        print('{} added, {} missing, {} changed ({} and {} entries)'.format(
+            counts[ADDED], counts[MISSING], counts[CHANGED], snapshotCount(args.old), snapshotCount(args.new)))
+        return 1 if any(counts.values()) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
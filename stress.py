@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import benchmark
+import calltiming
+import corpus
+import waiter
+import wrapper
+
+LEVEL_DURATION = 60.0
+CONCURRENCY_LEVELS = (1, 2, 4, 8)
+STOP_EVERY = 4
+STOP_AFTER = 0.05
+
+
+class OperationConsumer(object):
+    """per-operation sink of demultiplexed log lines"""
+
+    def __init__(self, opID, directory, totalBytes, started):
+        self.opID = opID
+        self.directory = directory
+        self.totalBytes = totalBytes
+        self.started = started
+        self.finished = None
+        self.lines = 0
+        self.stopped = False
+
+    def consume(self, logLine):
+        self.lines += 1
+
+    def linesPerSecond(self, now):
+        elapsed = (self.finished or now) - self.started
+        return self.lines / elapsed if elapsed > 0 else 0.0
+
+
+def jainFairness(values):
+    """Jain's fairness index, 1.0 when all values are equal, 1/n when one value takes everything"""
+    values = [value for value in values if value > 0]
+    if not values:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum(value * value for value in values))
+
+
+def histogramPercentiles(histogram, scale=1):
+    """calltiming.percentiles-shaped summary of a calltiming.LatencyHistogram, values divided by scale"""
+    return {
+        'min': histogram.percentile(0) / scale,
+        'p50': histogram.percentile(50) / scale,
+        'p90': histogram.percentile(90) / scale,
+        'p99': histogram.percentile(99) / scale,
+        'max': histogram.max / scale,
+        'mean': histogram.total / histogram.count / scale,
+        'samples': histogram.count
+    }
+
+
+def runLevel(lib, trees, concurrency, duration, stopEvery=STOP_EVERY, stopAfter=STOP_AFTER):
+    """keep concurrency operations running over trees for duration seconds, return the level report"""
+    demux = lib.demultiplexer
+    # histograms keep a soak of hours at a few hundred counters, backlog is sampled on every loop pass
+    backlog = calltiming.LatencyHistogram()
+    totalLines = 0
+    treeCycle = itertools.cycle(trees)
+    active = {}
+    completedCount = 0
+    completedBytes = 0
+    # running sums of the positive completed rates, Jain's index without keeping every operation
+    rateSum = rateSquares = 0.0
+    rateCount = 0
+    stopLatencies = calltiming.LatencyHistogram()
+    startedCount = 0
+    fairnessSamples = []
+    levelStart = time.perf_counter()
+    levelEnd = levelStart + duration
+    delay = waiter.MIN_DELAY
+    nextFairnessSample = levelStart + 1.0
+
+    while True:
+        now = time.perf_counter()
+        running = now < levelEnd
+        while running and len(active) < concurrency:
+            directory, totalBytes = next(treeCycle)
+            returnCode, opID = lib.directory(directory)
+            if returnCode != 0:
+                raise RuntimeError("HashDirectory failed: {}".format(wrapper.ReturnCodes[returnCode]))
+            startedCount += 1
+            consumer = OperationConsumer(opID, directory, totalBytes, time.perf_counter())
+            # every stopEvery-th operation is cancelled while running to measure HashStop under load
+            cancelAt = consumer.started + stopAfter if stopEvery and startedCount % stopEvery == 0 else None
+            demux.register(opID, consumer.consume)
+            active[opID] = (consumer, lib.statusPoller(opID), cancelAt)
+        if not active:
+            break
+
+        # the lines of one drain pass are the log backlog that built up since the previous pass
+        _, drained = demux.drain()
+        backlog.record(drained)
+        now = time.perf_counter()
+        finished = []
+        for opID, (consumer, poll, cancelAt) in list(active.items()):
+            returnCode, opRunning = poll()
+            if returnCode == 0 and opRunning and not (cancelAt is not None and now >= cancelAt) and running:
+                continue
+            stopStart = time.perf_counter()
+            lib.stop(opID)
+            stopEnd = time.perf_counter()
+            consumer.finished = stopEnd
+            if opRunning:
+                consumer.stopped = True
+                stopLatencies.record(int((stopEnd - stopStart) * 1e9))
+            else:
+                completedCount += 1
+                completedBytes += consumer.totalBytes
+                rate = consumer.linesPerSecond(consumer.finished)
+                if rate > 0:
+                    rateSum += rate
+                    rateSquares += rate * rate
+                    rateCount += 1
+            del active[opID]
+            finished.append(consumer)
+        if finished:
+            # the last lines of finished operations are routed before their consumers leave the demultiplexer
+            demux.drain()
+            for consumer in finished:
+                demux.unregister(consumer.opID)
+                totalLines += consumer.lines
+
+        if now >= nextFairnessSample and len(active) > 1:
+            fairnessSamples.append(jainFairness([consumer.linesPerSecond(now) for consumer, _, _ in active.values()]))
+            nextFairnessSample = now + 1.0
+
+        if drained:
+            delay = waiter.MIN_DELAY
+        else:
+            time.sleep(delay)
+            delay = min(delay * waiter.BACKOFF_FACTOR, waiter.MAX_DELAY)
+
+    elapsed = time.perf_counter() - levelStart
+    report = {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'operationsStarted': startedCount,
+        'operationsCompleted': completedCount,
+        'operationsStopped': stopLatencies.count,
+        'linesPerSec': totalLines / elapsed,
+        'completedMBps': completedBytes / elapsed / 1e6,
+        'orphanLines': demux.orphans,
+        'backlog': histogramPercentiles(backlog),
+        'fairness': benchmark.percentiles(fairnessSamples) if fairnessSamples else None,
+        'completedFairness': rateSum ** 2 / (rateCount * rateSquares) if rateCount else 1.0,
+        'stopLatencyMs': histogramPercentiles(stopLatencies, 1e6) if stopLatencies.count else None,
+    }
+    return report
+
+
+def runStress(libFullPath, trees, levels=CONCURRENCY_LEVELS, duration=LEVEL_DURATION, stopEvery=STOP_EVERY,
+              stopAfter=STOP_AFTER):
+    reports = []
+    with wrapper.HashLibrary(libFullPath) as lib:
+        for concurrency in levels:
+            report = runLevel(lib, trees, concurrency, duration, stopEvery, stopAfter)
+            reports.append(report)
+            printLevel(report, reports[0])
+    return reports
+
+
+def printLevel(report, baseReport):
+    stopLatency = report['stopLatencyMs']
+    print('concurrency {:3}: {:10.1f} lines/s ({:5.2f}x), {:8.1f} MB/s, backlog p99 {:6}, '
+          'stop p99 {} ms, fairness {:.3f}, {} ops'.format(
+              report['concurrency'], report['linesPerSec'],
+              report['linesPerSec'] / baseReport['linesPerSec'] if baseReport['linesPerSec'] else 0.0,
+              report['completedMBps'], report['backlog']['p99'],
+              '{:.2f}'.format(stopLatency['p99']) if stopLatency else '-',
+              report['completedFairness'], report['operationsStarted']
+          ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="concurrent HashDirectory stress and soak run")
+    parser.add_argument("directories", nargs="*",
+                        help="trees to hash, synthetic benchmark trees (small-files, medium-files) by default")
+    parser.add_argument("--lib", default=wrapper.defaultLibraryPath(), help="path to libhash.so")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=list(CONCURRENCY_LEVELS))
+    parser.add_argument("-d", "--duration", type=float, default=LEVEL_DURATION,
+                        help="seconds per concurrency level, e.g. 3600 for a one hour soak")
+    parser.add_argument("--stop-every", type=int, default=STOP_EVERY,
+                        help="cancel every n-th operation while running, 0 never")
+    parser.add_argument("--stop-after", type=float, default=STOP_AFTER, help="seconds before the cancellation")
+    parser.add_argument("--work-dir", default=benchmark.treesDirectory)
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.directories:
+        trees = [(directory, sum(os.path.getsize(os.path.join(root, name))
+                                 for root, _, names in os.walk(directory) for name in names))
+                 for directory in args.directories]
+    else:
+        trees = []
+        profiles = corpus.loadProfiles()
+        for treeName in ('small-files', 'medium-files'):
+            root = os.path.join(args.work_dir, treeName)
+            trees.append((root, corpus.generateCorpus(root, profiles[treeName])['bytes']))
+
+    reports = runStress(args.lib, trees, args.concurrency, args.duration, args.stop_every, args.stop_after)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(reports, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
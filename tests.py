@@ -1,22 +1,54 @@
 #!/usr/bin/env python3
 
 import wrapper
+import waiter
+import walker
 import os
-from logger import log
-import hashlib
+from logger import log, getMetricsLog
 import inspect
+import time
 
-inputLib = "libhash.so"
+inputLib = wrapper.defaultLibraryPath()
 inputDirectory = "./tested_dir"
+corpusProfile = None
 
+metrics = getMetricsLog(returnCodes=wrapper.ReturnCodes)
 
-def readhashLog(library):
+# modules used by a few tests only (digestcache, corpus, cancellation) are imported where they are needed, so
+# a run of a single quick test does not pay for them
+
+
+def useCorpus(profile):
+    """run the suite on the generated corpus tree of profile (see corpus_profiles.json) instead of tested_dir"""
+    global corpusProfile, inputDirectory
+    import corpus
+
+    corpusProfile = profile
+    inputDirectory = os.path.join(corpus.CORPUS_DIRECTORY, profile)
+
+
+def prepareCorpus():
+    """generate the corpus tree selected by useCorpus unless it is up to date"""
+    if corpusProfile:
+        import corpus
+
+        corpus.generateCorpus(inputDirectory, corpus.loadProfiles()[corpusProfile])
+
+
+# HASH_CORPUS=<profile> (corpus.CORPUS_ENV) selects a corpus tree for the whole run
+if os.environ.get('HASH_CORPUS'):
+    useCorpus(os.environ['HASH_CORPUS'])
+
+
+def readhashLog(library, echo=True):
     hashedFilesLogLines = []
-    print('')
+    if echo:
+        print('')
     while True:
         returnCode, logLine = wrapper.hashReadNextLogLine(library)
         if int(returnCode) == 0:
-            print('HashReadNextLogLine: {}.'.format(logLine))
+            if echo:
+                print('HashReadNextLogLine: {}.'.format(logLine))
             logLineParsed = logLine.split()
             hashedFilesLogLines.append(logLineParsed)
         else:
@@ -24,15 +56,133 @@ def readhashLog(library):
     return hashedFilesLogLines
 
 
+def expectedDigests(paths):
+    """reference MD5 digests {path: digest}, unchanged files are served from the on-disk digest cache"""
+    import digestcache
+
+    with digestcache.DigestCache() as cache:
+        digests = cache.md5Files(paths)
+        print('\nDigest cache: {hits} hits, {misses} misses.'.format(**cache.stats()))
+    return digests
+
+
+def expectedFiles(directory=None):
+    """{relative path (bytes): digest} of the files expected in the log of directory (inputDirectory by default)
+
+    A generated corpus tree is described by its manifest, any other directory is listed (not recursively) and
+    its digests are computed through the digest cache.
+    """
+    import corpus
+
+    if directory is None:
+        directory = inputDirectory
+    manifest = corpus.loadManifest(directory)
+    if manifest is not None:
+        return corpus.expectedDigests(manifest)
+    root = os.fsencode(directory)
+    files = [entry[0] for entry in walker.walk(directory, recursive=False, symlinks=walker.SYMLINKS_FILES)]
+    digests = expectedDigests([os.path.join(root, file) for file in files])
+    return {file: digests[os.path.join(root, file)] for file in files}
+
+
+def expectedFileCount(directory=None):
+    """count of the files expected in the log of directory (inputDirectory by default), no digest is computed
+
+    A generated corpus tree is counted from its manifest, any other directory is walked (not recursively).
+    """
+    import corpus
+
+    if directory is None:
+        directory = inputDirectory
+    manifest = corpus.loadManifest(directory)
+    if manifest is not None:
+        return len(manifest['entries'])
+    return sum(1 for _ in walker.walk(directory, recursive=False, symlinks=walker.SYMLINKS_FILES))
+
+
+def expectedWalk(directory=None):
+    """walker.WalkJoin of the files expected in the log of directory (inputDirectory by default)
+
+    A generated corpus tree is described by its manifest, any other directory is walked (not recursively).
+    """
+    import corpus
+
+    if directory is None:
+        directory = inputDirectory
+    manifest = corpus.loadManifest(directory)
+    if manifest is not None:
+        entries = ((os.fsencode(path), size, None, None) for path, size, md5 in manifest['entries'])
+        return walker.WalkJoin(directory, entries)
+    return walker.WalkJoin(directory, recursive=False, symlinks=walker.SYMLINKS_FILES)
+
+
 def waitforHashDirectory(library, opID:int):
-    while True:
-        returnCode, opRunning = wrapper.hashStatus(library, opID)
-        if int(returnCode) != 0 or not opRunning:
-            break
-    print('\nHashDirectory has finished.')
+    returnCode, stats = waiter.pollUntilDone(library, opID)
+    print('\nHashDirectory has finished, {} status polls, detected within {} us.'.format(
+        stats.polls, stats.detectionLatencyNs // 1000
+    ))
     return True, int(returnCode)
 
 
+# corpus tree of test15 when inputDirectory is not a corpus tree, it must take much longer to hash than one file
+STOP_PROFILE = 'small-files'
+
+# shared fixtures
+
+loadedLibraries = {}
+hashedDirectories = {}
+
+
+def loadLibrary():
+    """load inputLib once per run, later calls return the same library"""
+    library = loadedLibraries.get(inputLib)
+    if library is None:
+        library = loadedLibraries[inputLib] = wrapper.loadHashLibrary(inputLib)
+    return library
+
+
+class HashedDirectory(object):
+    """one complete init - HashDirectory - wait - read log - stop - terminate pass over a directory
+
+    Read-only tests share the collected HashResults instead of hashing the directory again.
+    """
+
+    def __init__(self, directory):
+        start = time.perf_counter()
+        self.directory = directory
+        self.uses = 0
+        self.returnCodeW = None
+        self.results = None
+
+        lib = loadLibrary()
+        self.returnCodeI = wrapper.hashInit(lib)
+        self.returnCodeD, self.ID = wrapper.hashDirectory(lib, directory)
+        if self.returnCodeD == 0:
+            ret, self.returnCodeW = waitforHashDirectory(lib, self.ID)
+            if ret:
+                print('')
+                returnCode, self.results = wrapper.drainLog(lib, echo=True)
+                wrapper.hashStop(lib, self.ID)
+        self.returnCodeT = wrapper.hashTerminate(lib)
+        self.elapsed = time.perf_counter() - start
+        metrics.event(test='hashedDirectory', call='HashDirectory', returnCode=self.returnCodeD,
+                      durationNs=int(self.elapsed * 1e9), files=len(self.results or ()), opID=self.ID)
+
+    def relativePath(self, path):
+        return walker.normalizePath(path, self.directory)
+
+
+def hashedDirectory(directory=None):
+    """shared HashedDirectory of directory (inputDirectory by default), created on first use in a run"""
+    if directory is None:
+        directory = inputDirectory
+    hashed = hashedDirectories.get(directory)
+    if hashed is None:
+        hashed = hashedDirectories[directory] = HashedDirectory(directory)
+    hashed.uses += 1
+    return hashed
+
+
 # tests
 
 def test1_positiveTestCase():
@@ -42,7 +192,7 @@ def test1_positiveTestCase():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         returnCodeI = wrapper.hashInit(lib)
         if returnCodeI != expectedReturnCode:
             log.error("{} - expected result hashInit: {}, actual result: {}".format(
@@ -87,30 +237,16 @@ def test2_checkCountOfHashedFiles():
     try:
         testPassed = False
 
-        files = []
-        with os.scandir(inputDirectory) as entries:
-            for entry in entries:
-                if entry.is_file():
-                    files.append(entry.name)
+        files = expectedFileCount()
 
-        lib = wrapper.loadHashLibrary(inputLib)
-        wrapper.hashInit(lib)
-        returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
-
-        logLines = None
-        if returnCodeD == 0:
-            ret, returnCodeW = waitforHashDirectory(lib, ID)
-            if ret:
-                logLines = readhashLog(lib)
-                wrapper.hashStop(lib, ID)
+        results = hashedDirectory().results
 
-        if files and not logLines:
-            log.error("{} - count of files in directory: {},files hashed: 0".format(testName, len(files)))
-        elif files and logLines and len(files) != len(logLines):
-            log.error("{} - count of files in directory: {},files hashed: {}".format(testName, len(files), len(logLines)))
+        if files and not results:
+            log.error("{} - count of files in directory: {},files hashed: 0".format(testName, files))
+        elif files and results and files != len(results):
+            log.error("{} - count of files in directory: {},files hashed: {}".format(testName, files, len(results)))
         else:
             testPassed = True
-        wrapper.hashTerminate(lib)
         return testPassed
     except Exception as e:
         log.exception("{} - {}".format(testName, e))
@@ -125,47 +261,24 @@ def test3_checkNamesOfHashedFiles():
     try:
         testPassed = False
 
-        files = []
-        with os.scandir(inputDirectory) as entries:
-            for entry in entries:
-                if entry.is_file():
-                    files.append(entry)
-        lib = wrapper.loadHashLibrary(inputLib)
-        wrapper.hashInit(lib)
-        returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
-
-        logLines = []
-        if returnCodeD == 0:
-            ret, returnCodeW = waitforHashDirectory(lib, ID)
-            if ret:
-                logLines = readhashLog(lib)
-                wrapper.hashStop(lib, ID)
-
-            actualHashedFiles = []
-            for logLine in logLines:
-                actualHashedFiles.append(logLine[1:])
-
-            calculatedHashedFiles = []
-            for file in files:
-                with open(file, "rb") as input_file:
-                    content = input_file.read()
-                    encoded_content = hashlib.md5(content)
-                    calculatedmd5 = encoded_content.hexdigest()
-                    # if "b'" at the begining is a bug
-                    # calculatedHashedFiles.append([file.name, calculatedmd5])
-                    calculatedHashedFiles.append(["b'" + file.name, "b'" + calculatedmd5])
-
-            # Comment:
-            # 1) I add string "b'" (I expect, it is not a bug, that the data in rows contains "b'" at the beginning),
-            # 2) file names contains / or /. (/rootfs-pkgs.txt)
-            # 3) this files are not from tested directoty
-
-            if sorted(calculatedmd5[0]) != sorted(actualHashedFiles[0]):
-                log.error("{} - comparison of file names failed".format(testName))
+        files = expectedWalk()
+        hashed = hashedDirectory()
+
+        if hashed.returnCodeD == 0 and hashed.results is not None:
+            # log lines are matched one by one against the walk, logged paths are normalized relative to the
+            # tested directory
+            files.feedLog(hashed.results)
+
+            if hashed.results.malformed:
+                log.error("{} - malformed log lines: {}".format(testName, hashed.results.malformed))
+            elif not files.fileCount or not files.complete():
+                log.error("{} - comparison of file names failed, not hashed: {}, not in tested directory: {}, "
+                          "hashed twice: {}".format(
+                              testName, files.missing(), sorted(files.unexpected), sorted(files.duplicates)
+                          ))
             else:
                 testPassed = True
 
-        wrapper.hashTerminate(lib)
         return testPassed
     except Exception as e:
         log.exception("{} - {}".format(testName, e))
@@ -179,48 +292,24 @@ def test4_checkHashesOfHashedFiles():
     try:
         testPassed = False
 
-        files = []
-        with os.scandir(inputDirectory) as entries:
-            for entry in entries:
-                if entry.is_file():
-                    files.append(entry)
+        expected = expectedFiles()
 
-        lib = wrapper.loadHashLibrary(inputLib)
-        wrapper.hashInit(lib)
-        returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
-        if returnCodeD == 0:
-            ret, returnCodeW = waitforHashDirectory(lib, ID)
-            if ret:
-                logLines = readhashLog(lib)
-                wrapper.hashStop(lib, ID)
+        hashed = hashedDirectory()
+        if hashed.returnCodeD == 0:
+            if hashed.results is not None:
+                missing, unexpected, mismatched = hashed.results.compare(expected, hashed.relativePath)
 
-                actualHashedFiles = []
-                for logLine in logLines:
-                    actualHashedFiles.append(logLine[1:])
-
-                calculatedHashedFiles = []
-                for file in files:
-                    with open(file, "rb") as input_file:
-                        content = input_file.read()
-                        encoded_content = hashlib.md5(content)
-                        calculatedmd5 = encoded_content.hexdigest()
-                        # calculatedHashedFiles.append([file.name, calculatedmd5])
-                        calculatedHashedFiles.append(["b'" + file.name, "b'" + calculatedmd5])
-
-                # Comment:
-                # hash MD5 - usually 32 lowercase hexadecimal digits ('d48691948fc6267bf5bc3715382e5ba4'),
-                # here I can see in debug mode this format: b'FFF094F5139CA6F3EE01BC94F4E3A3'
-                # now the test can not pass, files are not from tested direcotry
-
-                if sorted(calculatedmd5[0]) == sorted(actualHashedFiles[0]):
-                    if sorted(calculatedmd5[1]) != sorted(actualHashedFiles[1]):
-                        log.error("{} - comparison of hashes failed".format(testName))
-                    else:
-                        testPassed = True
+                if hashed.results.malformed:
+                    log.error("{} - malformed log lines: {}".format(testName, hashed.results.malformed))
+                elif missing or unexpected:
+                    log.error("{} - comparison of file names failed, not hashed: {}, not in tested directory: {}".format(
+                        testName, missing, unexpected
+                    ))
+                elif mismatched:
+                    log.error("{} - comparison of hashes failed: {}".format(testName, mismatched))
                 else:
-                    log.error("{} - comparison of file names failed".format(testName))
-            wrapper.hashTerminate(lib)
-            return testPassed
+                    testPassed = True
+        return testPassed
     except Exception as e:
         log.exception("{} - {}".format(testName, e))
         print(e)
@@ -233,27 +322,15 @@ def test5_checkIDsOfHashedFiles():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
-        wrapper.hashInit(lib)
-        returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
-
-        if returnCodeD == 0:
-            ret, returnCodeW = waitforHashDirectory(lib, ID)
-            if ret:
-                logLines = readhashLog(lib)
-                wrapper.hashStop(lib, ID)
-
-                actualHashedFilesIDs = []
-                for logLine in logLines:
-                    actualHashedFilesIDs.append(logLine[0])
+        hashed = hashedDirectory()
 
-                for identifier in actualHashedFilesIDs:
-                    if actualHashedFilesIDs.count(identifier) != 1:
-                        log.error("{} - ID {} is not unique identifier".format(testName, identifier))
-                        break
-                    else:
-                        testPassed = True
-        wrapper.hashTerminate(lib)
+        if hashed.returnCodeD == 0:
+            if hashed.results:
+                duplicateIDs = hashed.results.duplicateOpIDs()
+                if duplicateIDs:
+                    log.error("{} - ID {} is not unique identifier".format(testName, duplicateIDs[0]))
+                else:
+                    testPassed = True
         return testPassed
     except Exception as e:
         log.exception("{} - {}".format(testName, e))
@@ -270,7 +347,7 @@ def test6_hashInitTwice():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeI = wrapper.hashInit(lib)
 
@@ -295,7 +372,7 @@ def test7_fileInsteadOfDirectory():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeD, ID = wrapper.hashDirectory(lib,  "./tested_dir/HID_QA_TestSpecification.pdf")
         if returnCodeD == 0:
@@ -326,7 +403,7 @@ def test8_nonExistingDirectory():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeD, ID = wrapper.hashDirectory(lib, "./dir_none")
         if returnCodeD == 0:
@@ -354,7 +431,7 @@ def test9_missingHashInitBeforeHashDirectory():
     expectedReturnCode = 7
     testName = inspect.getframeinfo(inspect.currentframe()).function
     try:
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
 
         if returnCodeD != expectedReturnCode:
@@ -374,7 +451,7 @@ def test10_missingHashInitBeforeTerminate():
     expectedReturnCode = 7
     testName = inspect.getframeinfo(inspect.currentframe()).function
     try:
-        lib = wrapper.loadHashLibrary("libhash.so")
+        lib = loadLibrary()
         returnCodeT = wrapper.hashTerminate(lib)
         if returnCodeT != expectedReturnCode:
             log.error("{} - expected result hashTerminate: {}, actual result: {}".format(
@@ -395,7 +472,7 @@ def test11_hashStopTwice():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
 
@@ -427,7 +504,7 @@ def test12_hashStopInvalidID():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
         if returnCodeD == 0:
@@ -463,7 +540,7 @@ def test13_hashStopAfterTerminate():
     try:
         testPassed = False
 
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         returnCodeD, ID = wrapper.hashDirectory(lib, inputDirectory)
         if returnCodeD == 0:
@@ -493,7 +570,7 @@ def test14_hashTerminateTwice():
     expectedReturnCode = 7
     testName = inspect.getframeinfo(inspect.currentframe()).function
     try:
-        lib = wrapper.loadHashLibrary(inputLib)
+        lib = loadLibrary()
         wrapper.hashInit(lib)
         wrapper.hashTerminate(lib)
         returnCodeT = wrapper.hashTerminate(lib)
@@ -509,15 +586,130 @@ def test14_hashTerminateTwice():
         return False
 
 
+def test15_hashStopWhileRunning():
+    """stop a running operation after the first hashed file of a multi-file tree - check the error code, that the
+    operation was still running and that every line logged before and after the stop has a correct MD5 hash"""
+    expectedReturnCode = 0
+    testName = inspect.getframeinfo(inspect.currentframe()).function
+    try:
+        testPassed = False
+
+        import cancellation
+        import corpus
+
+        # tested_dir holds a single file, hashed before HashStop could be called
+        directory = inputDirectory
+        if corpus.loadManifest(directory) is None:
+            directory = os.path.join(corpus.CORPUS_DIRECTORY, STOP_PROFILE)
+            corpus.generateCorpus(directory, corpus.loadProfiles()[STOP_PROFILE])
+        expected = expectedFiles(directory)
+        lib = loadLibrary()
+        wrapper.hashInit(lib)
+        returnCodeD, ID = wrapper.hashDirectory(lib, directory)
+
+        if returnCodeD == 0:
+            stopped = cancellation.stopOperation(
+                lib, ID, expected, lambda path: walker.normalizePath(path, directory), afterFiles=1
+            )
+            print('\nHashStop after {} of {} files: log quiet within {} us, {} lines logged afterwards.'.format(
+                stopped['linesBeforeStop'], len(expected), stopped['quiescentNs'] // 1000, stopped['linesAfterStop']
+            ))
+            metrics.event(test=testName, call='HashStop', returnCode=stopped['stopReturnCode'],
+                          durationNs=stopped['stopCallNs'], files=stopped['linesBeforeStop'] + stopped['linesAfterStop'],
+                          opID=ID, quiescentNs=stopped['quiescentNs'])
+
+            if stopped['finishedEarly']:
+                log.error("{} - operation finished after {} of {} files before hashStop, nothing was stopped".format(
+                    testName, stopped['linesBeforeStop'], len(expected)
+                ))
+            elif stopped['stopReturnCode'] != expectedReturnCode:
+                log.error("{} - expected result hashStop: {}, actual result: {}".format(
+                    testName, wrapper.ReturnCodes[expectedReturnCode], wrapper.ReturnCodes[stopped['stopReturnCode']]
+                ))
+            elif stopped['linesBeforeStop'] + stopped['linesAfterStop'] >= len(expected):
+                log.error("{} - hashStop did not cancel the operation, all {} files were hashed, hashStop took {} ms"
+                          .format(testName, len(expected), stopped['stopCallNs'] // 1000000))
+            elif not stopped['consistent']:
+                log.error("{} - log after hashStop is inconsistent, duplicates: {}, not in tested directory: {}, "
+                          "wrong hashes: {}, malformed lines: {}".format(
+                              testName, stopped['duplicates'], stopped['unexpected'], stopped['mismatched'],
+                              stopped['malformed']
+                          ))
+            else:
+                testPassed = True
+        wrapper.hashTerminate(lib)
+        return testPassed
+    except Exception as e:
+        log.exception("{} - {}".format(testName, e))
+        print(e)
+        return False
+
+
+# tests which make the vendor library throw an uncaught exception and abort the interpreter (std::filesystem_error
+# on a file or a missing path) or hang (HashStop of a running operation), they run in a child process so that a
+# crash or a timeout fails only the test itself
+isolatedTests = {'test7_fileInsteadOfDirectory', 'test8_nonExistingDirectory', 'test15_hashStopWhileRunning'}
+
+# a working HashStop returns within milliseconds (generating the corpus tree takes about a second), a blocking one
+# fails test15 after STOP_TIMEOUT s instead of parallel.TEST_TIMEOUT
+STOP_TIMEOUT = 5.0
+isolatedTimeouts = {'test15_hashStopWhileRunning': STOP_TIMEOUT}
+
+
+def runTestCase(test):
+    """run one test, isolated tests in a child process (parallel.runIsolated) - return the result of the test"""
+    if test.__name__ not in isolatedTests:
+        return test()
+    import parallel
+
+    timeout = isolatedTimeouts.get(test.__name__, parallel.TEST_TIMEOUT)
+    results = parallel.runIsolated([test.__name__], inputLib, inputDirectory, workers=1, timeout=timeout, log=log)
+    passed, wallTime = results[test.__name__]
+    return passed
+
+
+def dumpCallTiming():
+    """print and record the native call latency histograms, only when wrapper call timing is enabled"""
+    snapshot = wrapper.callTimingSnapshot()
+    if not snapshot:
+        return
+    print('\nNative call latency:')
+    print('{:22} {:>8} {:>12} {:>10} {:>10} {:>10} {:>12}  {}'.format(
+        'function', 'calls', 'total ms', 'p50 ns', 'p99 ns', 'p99.9 ns', 'max ns', 'return codes'))
+    for function, summary in snapshot.items():
+        print('{:22} {count:8} {totalMs:12.3f} {p50Ns:10} {p99Ns:10} {p999Ns:10} {maxNs:12}  {codes}'.format(
+            function, totalMs=summary['totalNs'] / 1e6, codes=summary['returnCodes'], **summary))
+        metrics.event(call=function, durationNs=summary['totalNs'], **{
+            key: value for key, value in summary.items() if key != 'totalNs'
+        })
+
+
 def main(test_suit):
     counter = 0
+    prepareCorpus()
+    hashedDirectories.clear()
+    wallTimes = []
     for test in test_suit:
+        start = time.perf_counter()
+        result = False
         try:
-            result = test()
+            result = runTestCase(test)
             if not result:
                 counter += 1
         except Exception as e:
             log.exception(e)
+        wallTime = time.perf_counter() - start
+        wallTimes.append((test.__name__, wallTime))
+        metrics.event(test=test.__name__, durationNs=int(wallTime * 1e9), passed=bool(result))
+
+    # every reuse of a shared fixture saves one full pass over its directory
+    timeSaved = sum(hashed.elapsed * (hashed.uses - 1) for hashed in hashedDirectories.values())
+    print('\nWall time per test:')
+    for testName, wallTime in wallTimes:
+        print('{:45} {:10.3f} ms'.format(testName, wallTime * 1000))
+    print('{:45} {:10.3f} ms'.format('total', sum(wallTime for _, wallTime in wallTimes) * 1000))
+    print('{:45} {:10.3f} ms'.format('saved by shared fixtures', timeSaved * 1000))
+    dumpCallTiming()
 
     log.info("{} tests failed".format(counter))
 
@@ -536,7 +728,8 @@ tests_to_run = [
     test11_hashStopTwice,
     test12_hashStopInvalidID,
     test13_hashStopAfterTerminate,
-    test14_hashTerminateTwice
+    test14_hashTerminateTwice,
+    test15_hashStopWhileRunning
 ]
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+import collections
+import threading
+import time
+
+import hashresults
+import wrapper
+
+HASH_ERROR_LOG_EMPTY = 4
+
+MIN_DELAY = 50e-6
+MAX_DELAY = 10e-3
+BACKOFF_FACTOR = 2.0
+
+
+class WaitStats(object):
+    """counters of one wait for a HashDirectory operation
+
+    detectionLatencyNs is an upper bound of the time between the real end of the operation and its detection,
+    measured from the last poll which still reported a running operation.
+    """
+
+    def __init__(self):
+        self.polls = 0
+        self.elapsedNs = 0
+        self.detectionLatencyNs = 0
+        self.timedOut = False
+
+    def __repr__(self):
+        return 'WaitStats(polls={}, elapsedNs={}, detectionLatencyNs={}, timedOut={})'.format(
+            self.polls, self.elapsedNs, self.detectionLatencyNs, self.timedOut
+        )
+
+
+def pollUntilDone(library, opID, minDelay=MIN_DELAY, maxDelay=MAX_DELAY, backoffFactor=BACKOFF_FACTOR,
+                  timeout=None, stats=None):
+    """poll HashStatus with exponential backoff until the operation stops running or HashStatus fails
+
+    Returns (returnCode, stats), returnCode is None when timeout (in seconds) expired first.
+    """
+    if stats is None:
+        stats = WaitStats()
+    poll = wrapper.statusPoller(library, opID)
+    delay = minDelay
+    start = time.perf_counter_ns()
+    deadline = None if timeout is None else start + int(timeout * 1e9)
+    lastRunning = start
+    while True:
+        returnCode, opRunning = poll()
+        now = time.perf_counter_ns()
+        stats.polls += 1
+        if returnCode != 0 or not opRunning:
+            stats.detectionLatencyNs = now - lastRunning
+            break
+        lastRunning = now
+        if deadline is not None and now >= deadline:
+            stats.timedOut = True
+            returnCode = None
+            break
+        time.sleep(delay)
+        delay = min(delay * backoffFactor, maxDelay)
+    stats.elapsedNs = time.perf_counter_ns() - start
+    return returnCode, stats
+
+
+def waitForHashDirectory(library, opID, minDelay=MIN_DELAY, maxDelay=MAX_DELAY, backoffFactor=BACKOFF_FACTOR,
+                         timeout=None):
+    """wait for the operation on a background thread, return a Future resolving to the final HashStatus return code
+
+    The future carries the WaitStats of the wait in its stats attribute, on timeout it fails with TimeoutError.
+    """
+    # imported here, concurrent.futures is the heaviest import of the wrapper stack and few callers need it
+    from concurrent.futures import Future
+
+    future = Future()
+    future.stats = WaitStats()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            returnCode, stats = pollUntilDone(library, opID, minDelay, maxDelay, backoffFactor, timeout, future.stats)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            if stats.timedOut:
+                future.set_exception(TimeoutError('operation {} still running after {} s'.format(opID, timeout)))
+            else:
+                future.set_result(returnCode)
+
+    threading.Thread(target=run, name='HashWaiter-{}'.format(opID), daemon=True).start()
+    return future
+
+
+def iterResults(library, opID, minDelay=MIN_DELAY, maxDelay=MAX_DELAY, backoffFactor=BACKOFF_FACTOR,
+                demultiplexer=None):
+    """yield parsed log lines (opID, path, digest) of the operation while it is still hashing
+
+    The log is read through demultiplexer, by default the one shared by all readers of library, so only lines
+    of opID are yielded and lines of other operations are kept for their own readers. HASH_ERROR_LOG_EMPTY means nothing
+    is ready yet as long as the operation runs, then the status is polled with backoff. The generator ends once
+    the operation is not running and its lines are drained, or when a call fails; the last return code is the
+    generator's return value. A malformed line raises ValueError (see hashresults.parseLogLine).
+    """
+    if demultiplexer is None:
+        demultiplexer = wrapper.logDemultiplexer(library)
+    lines = collections.deque()
+    poll = wrapper.statusPoller(library, opID)
+    delay = minDelay
+    finished = False
+    demultiplexer.register(opID, lines.append)
+    try:
+        while True:
+            returnCode, _ = demultiplexer.drain()
+            if lines:
+                delay = minDelay
+            while lines:
+                yield hashresults.parseLogLine(lines.popleft())
+            if returnCode != HASH_ERROR_LOG_EMPTY or finished:
+                return returnCode
+            statusCode, opRunning = poll()
+            if statusCode != 0:
+                return statusCode
+            if not opRunning:
+                # lines may have been logged between the last read and the status call
+                finished = True
+                continue
+            time.sleep(delay)
+            delay = min(delay * backoffFactor, maxDelay)
+    finally:
+        demultiplexer.unregister(opID)
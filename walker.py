@@ -0,0 +1,118 @@
+import os
+import stat
+
+# how symbolic links are treated by walk
+SYMLINKS_SKIP = 'skip'
+SYMLINKS_FILES = 'files'
+SYMLINKS_FOLLOW = 'follow'
+
+# WalkJoin marker of a walked file already found in the log
+MATCHED = None
+
+
+def walk(root, recursive=True, maxDepth=None, symlinks=SYMLINKS_SKIP):
+    """stream (relativePath, size, inode, mtimeNs) of regular files under root, relativePath is bytes
+
+    Directories are scanned with os.scandir one at a time, nothing but the stack of pending directories is kept.
+    maxDepth limits recursion, 0 lists root only. symlinks is SYMLINKS_SKIP (ignore links), SYMLINKS_FILES
+    (follow links to files) or SYMLINKS_FOLLOW (follow links to files and directories, cycles are skipped).
+    """
+    if symlinks not in (SYMLINKS_SKIP, SYMLINKS_FILES, SYMLINKS_FOLLOW):
+        raise ValueError("unknown symlink policy: {}".format(symlinks))
+    if not recursive:
+        maxDepth = 0
+    root = os.fsencode(root)
+    rootStat = os.stat(root)
+    visited = {(rootStat.st_dev, rootStat.st_ino)}
+    pending = [(root, b'', 0)]
+    while pending:
+        directory, prefix, depth = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    isLink = entry.is_symlink()
+                    if isLink and symlinks == SYMLINKS_SKIP:
+                        continue
+                    entryStat = entry.stat(follow_symlinks=True)
+                except OSError:
+                    continue
+                relativePath = prefix + entry.name
+                if stat.S_ISREG(entryStat.st_mode):
+                    yield relativePath, entryStat.st_size, entryStat.st_ino, entryStat.st_mtime_ns
+                elif stat.S_ISDIR(entryStat.st_mode):
+                    if (maxDepth is not None and depth >= maxDepth) or (isLink and symlinks != SYMLINKS_FOLLOW):
+                        continue
+                    key = (entryStat.st_dev, entryStat.st_ino)
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                    pending.append((entry.path, relativePath + b'/', depth + 1))
+
+
+def normalizePath(path, root):
+    """path from the hash log (as bytes) relative to root, in the form yielded by walk
+
+    The library logs paths prefixed with the directory exactly as it was passed, e.g. ./tested_dir/file.pdf,
+    an absolute form of root is accepted too. Paths outside root are returned normalized but unchanged.
+    """
+    path = os.path.normpath(os.fsencode(path))
+    for prefix in (os.path.normpath(os.fsencode(root)), os.path.abspath(os.fsencode(root))):
+        if prefix == b'.':
+            if not os.path.isabs(path):
+                return path
+            continue
+        # normpath keeps the separator of the file system root only, b'/' is not extended to b'//'
+        if not prefix.endswith(b'/'):
+            prefix += b'/'
+        if path.startswith(prefix):
+            return path[len(prefix):]
+    return path
+
+
+class WalkJoin(object):
+    """incremental hash join of a directory walk with hashed log lines
+
+    The walk is loaded into one dict keyed by relative path, log lines are then streamed and matched one by one
+    (a matched entry is marked, not copied), so the log is never held in memory.
+    """
+
+    def __init__(self, root, entries=None, **walkOptions):
+        self.root = root
+        self.expected = {}
+        for relativePath, size, inode, mtime in (walk(root, **walkOptions) if entries is None else entries):
+            self.expected[relativePath] = (size, inode, mtime)
+        self.fileCount = len(self.expected)
+        self.matched = 0
+        self.duplicates = []
+        self.unexpected = []
+
+    def feed(self, path):
+        """match one hashed path, return True when it belongs to the walk"""
+        relativePath = normalizePath(path, self.root)
+        expected = self.expected
+        if relativePath not in expected:
+            self.unexpected.append(relativePath)
+            return False
+        if expected[relativePath] is MATCHED:
+            self.duplicates.append(relativePath)
+            return False
+        expected[relativePath] = MATCHED
+        self.matched += 1
+        return True
+
+    def feedLog(self, logLines):
+        """match parsed log lines (opID, path, digest), e.g. from waiter.iterResults or HashResults"""
+        for opID, path, digest in logLines:
+            self.feed(path)
+        return self
+
+    def missing(self):
+        """relative paths found by the walk and not hashed (so far)"""
+        return sorted(path for path, value in self.expected.items() if value is not MATCHED)
+
+    def complete(self):
+        return self.matched == self.fileCount and not self.unexpected and not self.duplicates
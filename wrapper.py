@@ -1,6 +1,11 @@
 import ctypes
+import os
+import threading
 import time
 
+import calltiming
+import hashresults
+
 ReturnCodes = {
     0: 'HASH_ERROR_OK',
     1: 'HASH_ERROR_GENERAL',
@@ -14,9 +19,61 @@ ReturnCodes = {
 }
 
 
+# environment variable with path of the library to test, e.g. reference/libhash.so built by make -C reference
+LIBRARY_ENV = 'HASH_LIBRARY'
+DEFAULT_LIBRARY = 'libhash.so'
+
+
+def defaultLibraryPath():
+    return os.environ.get(LIBRARY_ENV) or DEFAULT_LIBRARY
+
+
+# environment variable enabling latency histograms of all native calls, see enableCallTiming
+CALL_TIMING_ENV = 'HASH_CALL_TIMING'
+callTimer = None
+
+
+def enableCallTiming():
+    """time every native call of libraries loaded from now on, return the CallTimer collecting the data"""
+    global callTimer
+    if callTimer is None:
+        callTimer = calltiming.CallTimer()
+    return callTimer
+
+
+def callTimingSnapshot():
+    """per-function latency histogram summaries, call and return code counts, None when timing is disabled"""
+    if callTimer is None:
+        return None
+    return callTimer.snapshot(ReturnCodes)
+
+
+# restype and argtypes of every function declared in hash.h
+HashPrototypes = {
+    'HashInit': (ctypes.c_uint32, []),
+    'HashTerminate': (ctypes.c_uint32, []),
+    'HashDirectory': (ctypes.c_uint32, [ctypes.c_char_p, ctypes.POINTER(ctypes.c_size_t)]),
+    'HashReadNextLogLine': (ctypes.c_uint32, [ctypes.POINTER(ctypes.c_char_p)]),
+    'HashStatus': (ctypes.c_uint32, [ctypes.c_size_t, ctypes.POINTER(ctypes.c_bool)]),
+    'HashStop': (ctypes.c_uint32, [ctypes.c_size_t]),
+    'HashFree': (None, [ctypes.c_void_p])
+}
+
+
+def bindPrototypes(library):
+    """declare restype and argtypes of all hash.h functions on a loaded library, done once per library"""
+    for name, (restype, argtypes) in HashPrototypes.items():
+        function = getattr(library, name)
+        function.restype = restype
+        function.argtypes = argtypes
+    return library
+
+
 def loadHashLibrary(libFullPath):
     try:
-        lib = ctypes.cdll.LoadLibrary(libFullPath)
+        lib = bindPrototypes(ctypes.cdll.LoadLibrary(libFullPath))
+        if callTimer is not None:
+            callTimer.instrument(lib)
     except FileNotFoundError as e:
         print("Library file not found.")
         raise e
@@ -46,26 +103,133 @@ def hashTerminate(library):
 def hashDirectory(library, directoryFullPath):
     opID = ctypes.c_size_t(0)
 
-    returnCode = library.HashDirectory(ctypes.c_wchar_p(directoryFullPath), ctypes.byref(opID))
+    # hash.h expects const char*, c_wchar_p would pass only the first character of the path
+    returnCode = library.HashDirectory(os.fsencode(directoryFullPath), ctypes.byref(opID))
     print('\nHashDirectory Return code: {}, Operation ID: {}.'.format(ReturnCodes[returnCode], opID.value))
     return returnCode, int(opID.value)
 
 
 def hashReadNextLogLine(library):
-    HASHLENGTHINBYTE = 64
-    HashFunction = library.HashReadNextLogLine
-    HashFunction.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
-    
     logLine = ctypes.c_char_p()
-    buffer = (ctypes.c_char * (HASHLENGTHINBYTE + 1))()
     returnCode = library.HashReadNextLogLine(ctypes.byref(logLine))
-    
+
+    line = b''
     if (returnCode == 0):
-        ctypes.memmove(buffer, logLine, (HASHLENGTHINBYTE + 1))
+        # the line is null terminated, its length is taken from the returned pointer, not from a fixed size
+        line = logLine.value
         library.HashFree(logLine)
 
-    #When returnCode is 0 ('HASH_ERROR_OK'), buffer contains w_char array terminated by a null character
-    return returnCode, buffer.value
+    return returnCode, line
+
+
+class LogDemultiplexer(object):
+    """reads the shared log and routes every line to the consumer of its operation ID
+
+    HashReadNextLogLine returns the lines of all operations interleaved, all readers of one library share its
+    demultiplexer (see logDemultiplexer) so that none of them takes the lines of another. A consumer is a
+    callable taking the raw log line, it is called with the lock held and must not block. Lines of an operation
+    without a consumer are kept until the operation is registered (orphans counts them) or a drain with a
+    default consumer takes them. drain may be called from several threads.
+    """
+
+    def __init__(self, library):
+        # functions are looked up on every drain, so call timing or leak tracking enabled later is seen
+        self.library = library
+        self.logLine = ctypes.c_char_p()
+        self.logLineRef = ctypes.byref(self.logLine)
+        self.consumers = {}
+        self.unclaimed = {}
+        self.lock = threading.Lock()
+
+    @property
+    def orphans(self):
+        return sum(len(lines) for lines in self.unclaimed.values())
+
+    def register(self, opID, consumer):
+        """route the lines of opID to consumer, lines which arrived before are passed to it first"""
+        with self.lock:
+            self.consumers[opID] = consumer
+            for line in self.unclaimed.pop(opID, ()):
+                consumer(line)
+
+    def unregister(self, opID):
+        with self.lock:
+            self.consumers.pop(opID, None)
+
+    def drain(self, maxLines=None, default=None):
+        """read until the log is empty or maxLines lines were read
+
+        Lines of operations without a consumer, including the ones kept from earlier drains, go to default when
+        it is given. One output pointer is reused for all HashReadNextLogLine calls. Returns (returnCode, lines
+        read), returnCode is the code of the last call - HASH_ERROR_LOG_EMPTY when the log was drained,
+        HASH_ERROR_OK when maxLines was hit.
+        """
+        HashReadNextLogLine = self.library.HashReadNextLogLine
+        HashFree = self.library.HashFree
+        logLine = self.logLine
+        logLineRef = self.logLineRef
+        consumers = self.consumers
+        returnCode = 0
+        lines = 0
+        with self.lock:
+            if default is not None and self.unclaimed:
+                for unclaimed in self.unclaimed.values():
+                    for line in unclaimed:
+                        default(line)
+                self.unclaimed.clear()
+            while maxLines is None or lines < maxLines:
+                returnCode = HashReadNextLogLine(logLineRef)
+                if returnCode != 0:
+                    break
+                line = logLine.value
+                HashFree(logLine)
+                lines += 1
+                if not consumers and default is not None:
+                    default(line)
+                    continue
+                try:
+                    opID = int(line[:line.index(b' ')])
+                except ValueError:
+                    opID = None
+                consumer = consumers.get(opID, default)
+                if consumer is None:
+                    self.unclaimed.setdefault(opID, []).append(line)
+                else:
+                    consumer(line)
+        return returnCode, lines
+
+
+demultiplexerLock = threading.Lock()
+
+
+def logDemultiplexer(library):
+    """the LogDemultiplexer shared by all readers of library (from loadHashLibrary or a HashLibrary session),
+    created on first use"""
+    with demultiplexerLock:
+        demultiplexer = library.__dict__.get('logDemultiplexer')
+        if demultiplexer is None:
+            demultiplexer = library.logDemultiplexer = LogDemultiplexer(library)
+    return demultiplexer
+
+
+def drainLog(library, maxLines=None, results=None, echo=False):
+    """read log lines until the log is empty or maxLines lines were read, store them in HashResults
+
+    The log is read through the demultiplexer of library, lines of operations registered there by other readers
+    are routed to them, all other lines are stored. Returns (returnCode, results), returnCode is the code of
+    the last call - HASH_ERROR_LOG_EMPTY when the log was drained, HASH_ERROR_OK when maxLines was hit.
+    """
+    if results is None:
+        results = hashresults.HashResults()
+    consume = results.appendLogLine
+    if echo:
+        appendLogLine = consume
+
+        def consume(line):
+            print('HashReadNextLogLine: {}.'.format(line))
+            appendLogLine(line)
+    returnCode, _ = logDemultiplexer(library).drain(maxLines, consume)
+    return returnCode, results
 
 
 def hashStop(library, opID):
@@ -80,5 +244,95 @@ def hashStatus(library, opID):
     returnCode = library.HashStatus(ctypes.c_size_t(opID), ctypes.byref(opRunning))
     return returnCode, bool(opRunning)
 
-            
-  
+
+def statusPoller(library, opID):
+    """return a function polling HashStatus of one operation, arguments are converted once and reused
+
+    Works with a library from loadHashLibrary as well as with HashLibrary. The returned function is not
+    thread safe, every polling thread should create its own.
+    """
+    HashStatus = library.HashStatus
+    cOpID = ctypes.c_size_t(opID)
+    opRunning = ctypes.c_bool(False)
+    opRunningRef = ctypes.byref(opRunning)
+
+    def poll():
+        returnCode = HashStatus(cOpID, opRunningRef)
+        return returnCode, opRunning.value
+    return poll
+
+
+class HashLibrary(object):
+    """typed session over libhash, functions from hash.h are resolved and typed once and cached as attributes
+
+    Methods return the same values as the module functions but do not print return codes, so they are cheap
+    enough for polling loops. Used as a context manager, HashInit is called on enter and HashTerminate on exit
+    (only when HashInit succeeded).
+    """
+
+    def __init__(self, libFullPath):
+        self.library = loadHashLibrary(libFullPath)
+        self.HashInit = self.library.HashInit
+        self.HashTerminate = self.library.HashTerminate
+        self.HashDirectory = self.library.HashDirectory
+        self.HashReadNextLogLine = self.library.HashReadNextLogLine
+        self.HashStatus = self.library.HashStatus
+        self.HashStop = self.library.HashStop
+        self.HashFree = self.library.HashFree
+        self.initReturnCode = None
+
+    def __enter__(self):
+        self.initReturnCode = self.init()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self.initReturnCode == 0:
+            self.terminate()
+        self.initReturnCode = None
+        return False
+
+    def init(self):
+        return self.HashInit()
+
+    def terminate(self):
+        return self.HashTerminate()
+
+    def directory(self, directoryFullPath):
+        opID = ctypes.c_size_t(0)
+        returnCode = self.HashDirectory(os.fsencode(directoryFullPath), ctypes.byref(opID))
+        return returnCode, opID.value
+
+    def readNextLogLine(self):
+        logLine = ctypes.c_char_p()
+        returnCode = self.HashReadNextLogLine(ctypes.byref(logLine))
+        if returnCode != 0:
+            return returnCode, None
+        line = logLine.value
+        self.HashFree(logLine)
+        return returnCode, line
+
+    def drainLog(self, maxLines=None, results=None, echo=False):
+        return drainLog(self, maxLines, results, echo)
+
+    @property
+    def demultiplexer(self):
+        """the LogDemultiplexer shared by all readers of this session, created on first use"""
+        return logDemultiplexer(self)
+
+    def status(self, opID):
+        opRunning = ctypes.c_bool(False)
+        returnCode = self.HashStatus(opID, ctypes.byref(opRunning))
+        return returnCode, opRunning.value
+
+    def statusPoller(self, opID):
+        return statusPoller(self, opID)
+
+    def stop(self, opID):
+        return self.HashStop(opID)
+
+    def free(self, pointer):
+        self.HashFree(pointer)
+
+
+if os.environ.get(CALL_TIMING_ENV):
+    enableCallTiming()